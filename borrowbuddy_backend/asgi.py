@@ -5,3 +5,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'borrowbuddy_backend.settings')
 
 application = get_asgi_application()
+
+# Notification streams (portal.views.notification_stream) are only served
+# under ASGI. Start the broker now so one that listens to other processes is
+# subscribed before the first client connects.
+from portal.realtime import get_broker  # noqa: E402
+
+get_broker()
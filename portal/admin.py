@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Item, BorrowRecord
+from .models import User, Item, BorrowRecord, PaymentIntent, OutboundEmail, Reservation
 
 # Register your models here.
 
@@ -20,4 +20,22 @@ class BorrowRecordAdmin(admin.ModelAdmin):
     list_filter = ('status', 'borrow_date')
     search_fields = ('item__name', 'borrower__username')
 
+@admin.register(PaymentIntent)
+class PaymentIntentAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'purpose', 'status', 'payer', 'amount', 'created_at')
+    list_filter = ('purpose', 'status')
+    search_fields = ('order_id', 'payment_id', 'payer__username')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'last_error')
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('item', 'borrower', 'start_date', 'end_date', 'status')
+    list_filter = ('status',)
+    search_fields = ('item__name', 'borrower__username')
+
 admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
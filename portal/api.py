@@ -0,0 +1,95 @@
+import hashlib
+import json
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import mixins, permissions, viewsets
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.response import Response
+
+from .models import BorrowRecord, Item, Notification, User
+from .serializers import (
+    BorrowRecordSerializer, ItemSerializer, NotificationSerializer, PublicProfileSerializer,
+)
+
+
+class ConditionalGetMixin:
+    """Tag GET responses with an ETag of their data and answer 304 on a match.
+
+    The payload is still built, but an unchanged one is not sent again.
+    Per-user endpoints are marked private so shared caches don't keep them.
+    """
+
+    private = False
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and response.status_code == 200 and response.data is not None:
+            body = json.dumps(response.data, cls=JSONEncoder, sort_keys=True, separators=(',', ':'))
+            etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = Response(status=304)
+            response['ETag'] = etag
+            if self.private:
+                patch_cache_control(response, private=True)
+            patch_cache_control(response, no_cache=True)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ItemViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Available items newest first, optionally ``?category=``; any item by id."""
+
+    serializer_class = ItemSerializer
+    cursor_field = 'date_posted'
+
+    def get_queryset(self):
+        items = Item.objects.select_related('owner')
+        if self.action == 'list':
+            # Same (is_available, category, date_posted) index walk as browse_items.
+            items = items.filter(is_available=True)
+            category = self.request.query_params.get('category')
+            if category:
+                items = items.filter(category=category)
+        return items
+
+
+class ProfileViewSet(ConditionalGetMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Public profile of an active user, looked up by username."""
+
+    serializer_class = PublicProfileSerializer
+    queryset = User.objects.filter(is_active=True)
+    lookup_field = 'username'
+
+
+class BorrowRecordViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """The user's loans: ``?role=lender`` for items they lend, ``?status=`` a dashboard tab."""
+
+    serializer_class = BorrowRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_field = 'borrow_date'
+    private = True
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.request.query_params.get('role') == 'lender':
+            records = BorrowRecord.objects.filter(item__owner=user)
+        else:
+            records = BorrowRecord.objects.filter(borrower=user)
+        group = self.request.query_params.get('status')
+        if group in BorrowRecord.STATUS_GROUPS:
+            records = records.filter(status__in=BorrowRecord.STATUS_GROUPS[group])
+        return records.select_related('item__owner', 'borrower')
+
+
+class NotificationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """The user's notifications newest first, optionally ``?unread=1``."""
+
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_field = 'timestamp'
+    private = True
+
+    def get_queryset(self):
+        notifications = Notification.objects.filter(recipient=self.request.user)
+        if self.request.query_params.get('unread'):
+            notifications = notifications.filter(is_read=False)
+        return notifications
@@ -0,0 +1,14 @@
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+# Mounted under /api/v1/ with the 'v1' namespace, which NamespaceVersioning
+# reports as request.version.
+router = DefaultRouter()
+router.register('items', api.ItemViewSet, basename='item')
+router.register('users', api.ProfileViewSet, basename='profile')
+router.register('borrow-records', api.BorrowRecordViewSet, basename='borrow-record')
+router.register('notifications', api.NotificationViewSet, basename='notification')
+
+app_name = 'api'
+urlpatterns = router.urls
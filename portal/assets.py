@@ -0,0 +1,160 @@
+"""Static asset pipeline: fingerprinted, minified and precompressed files.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` writes each
+asset under a content-hashed name, records the mapping in the manifest that
+``{% static %}`` reads, and leaves ``.gz`` and ``.br`` siblings next to it
+(``.br`` needs the ``brotli`` package from requirements.txt). ``serve_asset``
+serves the results with the best encoding the client accepts.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico'}
+
+# Hashed names look like ``style.5d41402abc4b.css`` and never change content,
+# so they can be cached for a year; anything else gets a short lifetime.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+SHORT_CACHE_CONTROL = 'public, max-age=60'
+
+# Content codings in order of preference, with the suffix of their sibling.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Comments and quoted strings are matched together so neither is mistaken
+# for the other; strings pass through untouched.
+CSS_TOKEN = re.compile(r'(/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', re.S)
+CSS_PUNCTUATION_SPACE = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace from a stylesheet.
+
+    Only whitespace that can't change meaning is removed: around braces,
+    semicolons, commas and child combinators, and after a colon.
+    """
+    out = []
+    for i, part in enumerate(CSS_TOKEN.split(css)):
+        if i % 2:
+            if not part.startswith('/*'):
+                out.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = CSS_PUNCTUATION_SPACE.sub(r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        out.append(part)
+    return ''.join(out).replace(';}', '}').strip()
+
+
+def compress(data):
+    """Return ``{suffix: bytes}`` for every encoding that makes ``data`` smaller."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also minifies stylesheets and precompresses text assets."""
+
+    def __init__(self, *args, minify=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.minify = settings.STATICFILES_MINIFY if minify is None else minify
+
+    def stored_name(self, name):
+        # In development collectstatic usually hasn't run, so refer to files
+        # by their plain names; in production a missing manifest is an error.
+        if settings.DEBUG and not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def _save(self, name, content):
+        # Minify on the way in so the content hash covers the minified bytes.
+        if self.minify and name.endswith('.css') and not name.endswith('.min.css'):
+            content.seek(0)
+            content = ContentFile(minify_css(content.read().decode()).encode())
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(paths) | set(self.hashed_files.values()):
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            with self.open(name) as original:
+                data = original.read()
+            for suffix, body in compress(data).items():
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(body))
+
+
+def accepted_encodings(header):
+    """Map each coding in an ``Accept-Encoding`` header to its q-value."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding, params = coding.strip().lower(), params.strip()
+        if not coding:
+            continue
+        quality = 1.0
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def serve_asset(request, path):
+    """Serve ``path`` from STATIC_ROOT, or return None if there is no such file.
+
+    Picks the precompressed sibling the client prefers, and marks hashed
+    names immutable.
+    """
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(full_path):
+        return None
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding = None
+    for coding, suffix in ENCODINGS:
+        if accepted.get(coding, accepted.get('*', 0)) > 0 and os.path.isfile(full_path + suffix):
+            encoding, full_path = coding, full_path + suffix
+            break
+
+    stat = os.stat(full_path)
+    if not HASHED_NAME.search(path) and not was_modified_since(
+        request.headers.get('If-Modified-Since'), stat.st_mtime
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path) else SHORT_CACHE_CONTROL
+    return response
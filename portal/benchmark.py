@@ -0,0 +1,201 @@
+"""End-to-end load test of the lending workflow, used by ``benchmark_workflow``.
+
+Each workflow is one complete loan driven through the real URLs with the
+test client: browse, item detail, borrow (paying through a local gateway
+stand-in for paid items), approve, mark returned, confirm return and
+feedback. Latency and query counts are recorded per view.
+"""
+import hashlib
+import hmac
+import json
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import DatabaseError, close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+from .middleware import QueryRecorder
+from .models import BorrowRecord, PaymentIntent
+from .payments import reset_gateway
+
+GATEWAY_KEY_ID = 'rzp_test_benchmark'
+GATEWAY_KEY_SECRET = 'benchmark_secret'
+
+
+class LocalGatewayHandler(BaseHTTPRequestHandler):
+    """Answers order creation like the Razorpay orders API, with unique ids."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        body = json.dumps({
+            'id': f'order_{uuid.uuid4().hex[:14]}',
+            'amount': payload.get('amount'),
+            'currency': payload.get('currency'),
+            'notes': payload.get('notes', {}),
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@contextmanager
+def local_gateway():
+    """Run the gateway stand-in and yield the settings that point at it."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), LocalGatewayHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    reset_gateway()
+    try:
+        yield {
+            'RAZORPAY_BASE_URL': f'http://127.0.0.1:{server.server_address[1]}',
+            'RAZORPAY_KEY_ID': GATEWAY_KEY_ID,
+            'RAZORPAY_KEY_SECRET': GATEWAY_KEY_SECRET,
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+        reset_gateway()
+
+
+def payment_signature(order_id, payment_id):
+    message = f'{order_id}|{payment_id}'.encode()
+    return hmac.new(GATEWAY_KEY_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class WorkflowError(Exception):
+    """A step of a workflow got an unexpected response."""
+
+
+class WorkflowRunner:
+    """Drive loans through the site and collect per-view timings.
+
+    One runner is shared by all threads; samples are appended under a lock.
+    """
+
+    def __init__(self, host='localhost'):
+        self.host = host
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.failed_workflows = 0
+        self.lock = threading.Lock()
+
+    def client(self, user):
+        client = Client(SERVER_NAME=self.host)
+        client.force_login(user)
+        return client
+
+    def request(self, client, view, url, method='get', data=None, expect=(200, 302)):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data or {})
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        # The test client skips the end-of-request cleanup a server would do.
+        close_old_connections()
+        with self.lock:
+            self.samples[view].append((elapsed_ms, recorder.count))
+            if response.status_code not in expect:
+                self.errors[view] += 1
+        if response.status_code not in expect:
+            raise WorkflowError(f'{view} returned {response.status_code}')
+        return response
+
+    def borrow(self, borrower_client, borrower, item):
+        self.request(borrower_client, 'borrow_item', reverse('borrow_item', args=[item.pk]))
+        if not item.rental_fee:
+            return BorrowRecord.objects.filter(item=item, borrower=borrower).latest('pk')
+        # Paid item: the page above created a gateway order; pay it as the
+        # checkout script would.
+        order_id = PaymentIntent.objects.filter(item=item, payer=borrower).latest('pk').order_id
+        payment_id = f'pay_{uuid.uuid4().hex[:14]}'
+        self.request(borrower_client, 'payment_success', reverse('payment_success'), 'post', {
+            'razorpay_order_id': order_id,
+            'razorpay_payment_id': payment_id,
+            'razorpay_signature': payment_signature(order_id, payment_id),
+        })
+        return BorrowRecord.objects.get(razorpay_order_id=order_id)
+
+    def run_workflow(self, owner, borrower, item):
+        try:
+            owner_client, borrower_client = self.client(owner), self.client(borrower)
+            self.request(borrower_client, 'browse_items', reverse('browse_items'))
+            self.request(borrower_client, 'item_detail', reverse('item_detail', args=[item.pk]))
+            record = self.borrow(borrower_client, borrower, item)
+            self.request(owner_client, 'approve_request', reverse('approve_request', args=[record.pk]))
+            self.request(borrower_client, 'mark_as_returned', reverse('mark_as_returned', args=[record.pk]))
+            self.request(owner_client, 'confirm_return', reverse('confirm_return', args=[record.pk]))
+            url = reverse('leave_feedback', args=[record.pk])
+            self.request(borrower_client, 'leave_feedback', url)
+            self.request(borrower_client, 'leave_feedback:post', url, 'post', {'rating': 5, 'comment': 'Great lender'})
+        except (WorkflowError, DatabaseError):
+            # A lock timeout on SQLite is a failed loan, not a crashed worker.
+            with self.lock:
+                self.failed_workflows += 1
+        finally:
+            connections.close_all()
+
+    def summary(self, elapsed):
+        """Return per-view latency percentiles and query counts plus overall throughput."""
+        views = {}
+        for view, samples in sorted(self.samples.items()):
+            latencies = [ms for ms, queries in samples]
+            views[view] = {
+                'requests': len(samples),
+                'errors': self.errors[view],
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'queries_per_request': round(sum(queries for ms, queries in samples) / len(samples), 2),
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            'requests': total,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(total / elapsed, 1) if elapsed else 0.0,
+            'failed_workflows': self.failed_workflows,
+            'views': views,
+        }
+
+
+def compare_to_baseline(result, baseline, tolerance):
+    """List the ways ``result`` is worse than ``baseline``.
+
+    Latency may grow by ``tolerance`` (a fraction) before it counts; any
+    increase in queries per request counts.
+    """
+    regressions = []
+    for view, current in result['views'].items():
+        previous = baseline['views'].get(view)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{view} {metric} {previous[metric]} -> {current[metric]}')
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(
+                f"{view} queries/request {previous['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    if result['requests_per_second'] < baseline['requests_per_second'] * (1 - tolerance):
+        regressions.append(f"requests/s {baseline['requests_per_second']} -> {result['requests_per_second']}")
+    return regressions
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+VERSION_KEY = 'catalogue:version'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOGUE_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 600)
+
+
+def record(name, outcome, count=1):
+    with _stats_lock:
+        _stats[f'{name}:{outcome}'] += count
+
+
+def cache_stats():
+    """Return this process's hit/miss counters, e.g. ``{'browse:hit': 3}``."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def catalogue_version():
+    """Return the current catalogue version, starting at 1."""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue fragment at once."""
+    cache = get_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # The counter was evicted; any fresh value differs from what was cached.
+        cache.add(VERSION_KEY, 1, timeout=None)
+        return cache.incr(VERSION_KEY)
+
+
+def make_key(name, parts=(), version=None):
+    if version is None:
+        version = catalogue_version()
+    digest = hashlib.md5(repr(tuple(parts)).encode()).hexdigest()
+    return f'catalogue:{name}:v{version}:{digest}'
+
+
+def cached_fragment(name, parts, render):
+    """Return the HTML for a fragment, rendering and caching it on a miss.
+
+    Returns ``(html, hit)``.
+    """
+    cache = get_cache()
+    key = make_key(name, parts)
+    html = cache.get(key)
+    if html is not None:
+        record(name, 'hit')
+        return mark_safe(html), True
+    record(name, 'miss')
+    html = render()
+    cache.set(key, html, get_timeout())
+    return html, False
+
+
+def render_item_cards(items):
+    """Render the card of each item, reusing cached cards with one get_many.
+
+    Items carrying a per-request ``distance_km`` are always rendered fresh.
+    """
+    cache = get_cache()
+    version = catalogue_version()
+    keys = {item.pk: make_key('item_card', [item.pk], version) for item in items}
+    cached = cache.get_many(keys.values())
+    cards, fresh, hits = [], {}, 0
+    for item in items:
+        distance_km = getattr(item, 'distance_km', None)
+        if distance_km is not None:
+            cards.append(render_to_string('includes/item_card.html', {'item': item, 'distance_km': distance_km}))
+            continue
+        key = keys[item.pk]
+        html = cached.get(key)
+        if html is None:
+            html = render_to_string('includes/item_card.html', {'item': item})
+            fresh[key] = html
+        else:
+            hits += 1
+        cards.append(mark_safe(html))
+    record('item_card', 'hit', hits)
+    record('item_card', 'miss', len(fresh))
+    if fresh:
+        cache.set_many(fresh, get_timeout())
+    return cards
@@ -0,0 +1,77 @@
+"""Cheap validators for conditional GETs of the catalogue pages.
+
+Each page's ETag is derived from what its content depends on, found
+without rendering: the catalogue version (a cache read) for home and
+browse, plus the item's ``updated_at`` and owner rating (one query by
+primary key) for an item page. The viewer is mixed in because the header
+and forms differ per user, so a 304 never hands one visitor's page to
+another.
+
+No Last-Modified is sent: the pages change with the viewer and with
+reservations, and no single timestamp covers those.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .catalogue_cache import catalogue_version
+from .models import Item
+
+
+def page_etag(request, *parts):
+    """Hash ``parts`` with the viewer, or None when the page can't be revalidated.
+
+    A page carrying flash messages is always rendered so they are shown.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    user = request.user
+    viewer = (user.pk, user.unread_notifications_count, user.geohash) if user.is_authenticated else None
+    # The CSRF token in the page's forms must match the visitor's cookie.
+    material = repr((parts, viewer, request.COOKIES.get(settings.CSRF_COOKIE_NAME)))
+    return hashlib.md5(material.encode()).hexdigest()
+
+
+def home_etag(request):
+    return page_etag(request, 'home', catalogue_version())
+
+
+def browse_etag(request):
+    return page_etag(request, 'browse', catalogue_version(), sorted(request.GET.lists()))
+
+
+def item_state(request, item_id):
+    """``(updated_at, owner rating)`` of the item, or None; fetched once per request."""
+    states = request.__dict__.setdefault('_item_states', {})
+    if item_id not in states:
+        states[item_id] = Item.objects.filter(pk=item_id).values_list('updated_at', 'owner__average_rating').first()
+    return states[item_id]
+
+
+def item_etag(request, item_id):
+    state = item_state(request, item_id)
+    if state is None:
+        return None
+    # Reservations don't touch the item row but do bump the catalogue version.
+    return page_etag(request, 'item', item_id, state, catalogue_version())
+
+
+def revalidate(etag_func):
+    """``condition()`` for personalised pages: answer 304 before the view
+    runs, and make browsers revalidate every time instead of guessing a
+    freshness lifetime.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
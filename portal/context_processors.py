@@ -1,7 +1,6 @@
-from .models import Notification
-
 def unread_notifications_context(request):
+    # The counter lives on the user row that the auth middleware already
+    # loaded, so this costs no extra query.
     if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-        return {'unread_notifications_count': unread_count}
+        return {'unread_notifications_count': request.user.unread_notifications_count}
     return {}
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+
+# Apps whose reads always stay on the primary: a session written by a login
+# must be visible on the very next request, whatever the replica lag. The
+# session's user is loaded before use_read_replica switches reads over.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_read_replica = ContextVar('read_replica', default=False)
+
+
+@contextmanager
+def reading_from_replica():
+    """Send ORM reads in this block to the replica, if one is configured."""
+    token = _read_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_replica.reset(token)
+
+
+def use_read_replica(view):
+    """Decorate a read-only view so its queries may be served by the replica.
+
+    Only views that never write, and can tolerate a few seconds of replica
+    lag, should be marked.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Resolve the lazy request.user on the primary, so a user who has
+        # just signed up or logged in isn't shown as logged out.
+        if hasattr(request, 'user'):
+            request.user.is_authenticated
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Route reads inside :func:`use_read_replica` views to the replica alias.
+
+    Without a replica configured every query goes to ``default``. Writes,
+    and reads inside a transaction on the primary, are never redirected.
+    """
+
+    replica_alias = REPLICA_ALIAS
+
+    def db_for_read(self, model, **hints):
+        if not _read_replica.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        if self.replica_alias not in connections.databases:
+            return None
+        if connections['default'].in_atomic_block:
+            return None
+        return self.replica_alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != self.replica_alias
@@ -1,5 +1,6 @@
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, PasswordChangeForm as AuthPasswordChangeForm
 from django import forms
+from django.utils import timezone
 from .models import User, Item, Feedback
 
 class CustomUserCreationForm(UserCreationForm):
@@ -36,10 +37,18 @@ class UserUpdateForm(forms.ModelForm):
     first_name = forms.CharField(required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
     last_name = forms.CharField(required=True, widget=forms.TextInput(attrs={'class': 'form-control'}))
     location = forms.CharField(required=False, widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., Pune, Maharashtra'}))
+    latitude = forms.FloatField(required=False, min_value=-90, max_value=90, widget=forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'e.g., 18.5204'}))
+    longitude = forms.FloatField(required=False, min_value=-180, max_value=180, widget=forms.NumberInput(attrs={'class': 'form-control', 'step': 'any', 'placeholder': 'e.g., 73.8567'}))
 
     class Meta:
         model = User
-        fields = ['first_name', 'last_name', 'location']
+        fields = ['first_name', 'last_name', 'location', 'latitude', 'longitude']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if (cleaned_data.get('latitude') is None) != (cleaned_data.get('longitude') is None):
+            raise forms.ValidationError("Please provide both latitude and longitude, or neither.")
+        return cleaned_data
 
 class PasswordChangeForm(AuthPasswordChangeForm):
     old_password = forms.CharField(label="Current Password", widget=forms.PasswordInput(attrs={'class': 'form-control', 'autocomplete': 'current-password'}))
@@ -53,4 +62,25 @@ class FeedbackForm(forms.ModelForm):
         widgets = {
             'rating': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 5}),
             'comment': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Leave a comment...'}),
-        }
\ No newline at end of file
+        }
+
+
+class ReservationForm(forms.Form):
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def __init__(self, *args, item=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.item = item
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start and end:
+            if start < timezone.localdate():
+                raise forms.ValidationError("Reservations cannot start in the past.")
+            if end < start:
+                raise forms.ValidationError("The end date must be on or after the start date.")
+            if self.item and (end - start).days + 1 > self.item.borrowing_period:
+                raise forms.ValidationError(f"This item can be borrowed for at most {self.item.borrowing_period} days.")
+        return cleaned_data
@@ -0,0 +1,141 @@
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision stored on users; about 150m x 150m cells.
+GEOHASH_PRECISION = 7
+
+# Most geohash cells a proximity query may OR together before it falls back
+# to a coarser precision.
+MAX_COVER_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate pair as a base-32 geohash string."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the ``(lat_degrees, lng_degrees)`` spanned by one geohash cell."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return ``(min_lat, max_lat, min_lng, max_lng)`` enclosing a circle."""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    d_lng = 180.0 if cos_lat < 1e-6 else min(180.0, d_lat / cos_lat)
+    return (
+        max(-90.0, latitude - d_lat), min(90.0, latitude + d_lat),
+        max(-180.0, longitude - d_lng), min(180.0, longitude + d_lng),
+    )
+
+
+def _steps(start, stop, step):
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(box, max_cells=MAX_COVER_CELLS):
+    """Return the geohash prefixes of the cells that cover a bounding box.
+
+    The finest precision that needs no more than ``max_cells`` cells is used,
+    so each prefix becomes one short range scan on the indexed geohash column.
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lng_step = cell_size(precision)
+        if ((max_lat - min_lat) / lat_step + 2) * ((max_lng - min_lng) / lng_step + 2) > max_cells:
+            continue
+        return sorted({
+            encode_geohash(lat, lng, precision)
+            for lat in _steps(min_lat, max_lat, lat_step)
+            for lng in _steps(min_lng, max_lng, lng_step)
+        })
+    return []
+
+
+def parse_point(value):
+    """Parse ``"lat,lng"`` into a float pair, or return ``None``."""
+    try:
+        lat, lng = (float(part) for part in (value or '').split(','))
+    except ValueError:
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    return lat, lng
+
+
+def parse_radius(value, default, maximum):
+    """Parse a radius in kilometres, clamped to ``(0.1, maximum]``."""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return default
+    if not math.isfinite(radius):
+        return default
+    return min(max(radius, 0.1), maximum)
+
+
+def nearby_items(items, origin, radius_km):
+    """Return items whose owner is within ``radius_km`` of ``origin``, nearest first.
+
+    Candidates are narrowed in SQL with geohash prefix ranges and a bounding
+    box; the exact haversine distance is then computed for the survivors only.
+    Each returned item has a ``distance_km`` attribute.
+    """
+    lat, lng = origin
+    box = bounding_box(lat, lng, radius_km)
+    cells = Q()
+    for prefix in covering_cells(box):
+        # A range instead of LIKE 'prefix%' so the geohash index is usable.
+        cells |= Q(owner__geohash__gte=prefix, owner__geohash__lt=prefix + '~')
+    candidates = items.filter(
+        cells,
+        owner__latitude__range=(box[0], box[1]),
+        owner__longitude__range=(box[2], box[3]),
+    ).select_related('owner')
+
+    results = []
+    for item in candidates:
+        distance = haversine_km(lat, lng, item.owner.latitude, item.owner.longitude)
+        if distance <= radius_km:
+            item.distance_km = distance
+            results.append(item)
+    results.sort(key=lambda item: item.distance_km)
+    return results
@@ -0,0 +1,115 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .catalogue_cache import bump_catalogue_version
+from .models import Item
+
+logger = logging.getLogger('portal.images')
+
+# Widths rendered for srcset; cards use the smallest, the detail page the rest.
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Format name -> (Pillow format, file extension, encoder options).
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(source, width, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'item_images/variants/{stem}-{width}w.{extension}'
+
+
+def render_variants(source):
+    """Resize and re-encode one stored image; safe to run in a worker process.
+
+    Only pixel data is written back, so EXIF (including GPS) and other
+    metadata are dropped. Returns the fields to store on the item.
+    """
+    with default_storage.open(source, 'rb') as stored:
+        with Image.open(stored) as original:
+            # Bake the EXIF orientation into the pixels before it is discarded.
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    width, height = image.size
+
+    # Never upscale: narrow originals get one variant at their own width.
+    targets = sorted({w for w in VARIANT_WIDTHS if w < width} | {min(width, max(VARIANT_WIDTHS))})
+    variants = {name: {} for name in VARIANT_FORMATS}
+    for target in targets:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS,
+        )
+        for name, (fmt, extension, options) in VARIANT_FORMATS.items():
+            frame = resized.convert('RGB') if fmt == 'JPEG' else resized
+            buffer = io.BytesIO()
+            frame.save(buffer, fmt, **options)
+            path = variant_name(source, target, extension)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variants[name][str(target)] = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return {'image_width': width, 'image_height': height, 'image_variants': dict(variants, source=source)}
+
+
+def save_variants(item_id, source, fields):
+    """Store rendered variants unless the item's image changed meanwhile."""
+    updated = Item.objects.filter(pk=item_id, image=source).update(**fields, updated_at=timezone.now())
+    if updated:
+        # update() sends no post_save; cached cards still point at the original.
+        bump_catalogue_version()
+    return updated
+
+
+def process_item_image(item_id, source):
+    try:
+        fields = render_variants(source)
+    except Exception:
+        logger.exception('could not process image %s of item %s', source, item_id)
+        return False
+    return bool(save_variants(item_id, source, fields))
+
+
+def process_in_background(item_id, source):
+    try:
+        process_item_image(item_id, source)
+    finally:
+        # Worker threads hold their own connections; don't leak them.
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+                    thread_name_prefix='item-images',
+                )
+    return _executor
+
+
+def schedule_item_image(item):
+    """Process an item's image in the background once the save has committed.
+
+    Items that are missed (e.g. the process exits first) keep serving the
+    original and are picked up by ``process_item_images``.
+    """
+    if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+        get_executor().submit(process_in_background, item.pk, item.image.name)
+    else:
+        process_item_image(item.pk, item.image.name)
@@ -0,0 +1,109 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger('portal.mail')
+
+
+def get_max_attempts():
+    return getattr(settings, 'MAIL_QUEUE_MAX_ATTEMPTS', 5)
+
+
+def get_lease():
+    return timedelta(seconds=getattr(settings, 'MAIL_QUEUE_LEASE', 300))
+
+
+def retry_delay(attempts):
+    """Exponential backoff before the next try, capped at one hour."""
+    base = getattr(settings, 'MAIL_QUEUE_RETRY_BACKOFF', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """Queue an email for the worker and return the outbox row immediately."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or '',
+        recipients=list(recipients),
+    )
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker.
+
+    Claimed rows have their attempt counted and are hidden from other workers
+    for the lease period, so a worker that dies mid-batch only delays them.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(status='QUEUED', next_attempt_at__lte=now).order_by('next_attempt_at')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('pk', flat=True)[:batch_size])
+        OutboundEmail.objects.filter(pk__in=ids).update(attempts=F('attempts') + 1, next_attempt_at=now + get_lease())
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by('next_attempt_at', 'pk'))
+
+
+def deliver_batch(batch_size=100):
+    """Send one batch of due email over a single backend connection.
+
+    Returns throughput figures: ``claimed``, ``sent``, ``retried``, ``dead``,
+    ``seconds`` and ``per_second``.
+    """
+    started = time.perf_counter()
+    outbox = claim_batch(batch_size)
+    stats = {'claimed': len(outbox), 'sent': 0, 'retried': 0, 'dead': 0}
+    if outbox:
+        backend = get_connection(fail_silently=False)
+        try:
+            backend.open()
+        except Exception as exc:
+            # Nothing can be sent this round; every claimed message is retried.
+            for message in outbox:
+                stats[record_failure(message, exc)] += 1
+        else:
+            try:
+                for message in outbox:
+                    email = EmailMessage(message.subject, message.body, message.from_email or None,
+                                         message.recipients, connection=backend)
+                    try:
+                        email.send()
+                    except Exception as exc:
+                        stats[record_failure(message, exc)] += 1
+                    else:
+                        OutboundEmail.objects.filter(pk=message.pk).update(
+                            status='SENT', sent_at=timezone.now(), last_error='',
+                        )
+                        stats['sent'] += 1
+            finally:
+                backend.close()
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['per_second'] = stats['sent'] / stats['seconds'] if stats['seconds'] else 0.0
+    if outbox:
+        logger.info('mail batch claimed=%(claimed)d sent=%(sent)d retried=%(retried)d dead=%(dead)d '
+                    'seconds=%(seconds).2f per_second=%(per_second).1f', stats)
+    return stats
+
+
+def record_failure(message, exc):
+    """Schedule a retry, or dead-letter the message once attempts run out."""
+    error = f'{type(exc).__name__}: {exc}'
+    if message.attempts >= get_max_attempts():
+        OutboundEmail.objects.filter(pk=message.pk).update(status='DEAD', last_error=error)
+        logger.error('mail %s dead-lettered after %d attempts: %s', message.pk, message.attempts, error)
+        return 'dead'
+    OutboundEmail.objects.filter(pk=message.pk).update(
+        next_attempt_at=timezone.now() + retry_delay(message.attempts), last_error=error,
+    )
+    logger.warning('mail %s failed (attempt %d): %s', message.pk, message.attempts, error)
+    return 'retried'
@@ -0,0 +1,21 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portal.notifications import archive_notifications
+
+
+class Command(BaseCommand):
+    help = "Move read notifications older than the retention period into the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help=f"Retention in days (default: NOTIFICATION_RETENTION_DAYS, {settings.NOTIFICATION_RETENTION_DAYS}).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        archived = archive_notifications(older_than_days=options['days'], batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} notifications in {elapsed:.2f}s."))
@@ -0,0 +1,106 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+from portal.db import REPLICA_ALIAS
+from portal.models import Item, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare request throughput of the read-heavy pages (browse, item detail, public profile) "
+        "with a new connection per request, persistent connections and, if configured, the read replica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help="Requests per mode.")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS.")
+
+    def urls(self):
+        items = list(Item.objects.values_list('pk', flat=True)[:50])
+        usernames = list(User.objects.filter(lended_items__isnull=False).values_list('username', flat=True).distinct()[:20])
+        if not items:
+            raise CommandError("There are no items to request; load some data first.")
+        urls = [reverse('browse_items')]
+        urls += [reverse('item_detail', args=[pk]) for pk in items]
+        urls += [reverse('public_profile', args=[username]) for username in usernames]
+        return urls
+
+    def configure(self, conn_max_age, replica):
+        """Apply a mode: connection lifetime on every alias and replica on or off."""
+        if replica:
+            connections.databases.update(self.databases)
+        else:
+            # Without the alias the router keeps every read on default.
+            connections.databases.pop(REPLICA_ALIAS, None)
+        for alias in connections:
+            connections[alias].close()
+            connections[alias].settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+    def run(self, urls, total, threads, host):
+        """Issue ``total`` GETs over ``threads`` threads; return (seconds, errors)."""
+        counter = iter(range(total))
+        lock = threading.Lock()
+        errors = [0]
+
+        def worker():
+            client = Client(SERVER_NAME=host)
+            try:
+                while True:
+                    with lock:
+                        n = next(counter, None)
+                    if n is None:
+                        return
+                    response = client.get(urls[n % len(urls)])
+                    # The test client skips the end-of-request connection
+                    # cleanup, so apply CONN_MAX_AGE here like a real server.
+                    close_old_connections()
+                    if response.status_code != 200:
+                        with lock:
+                            errors[0] += 1
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return time.perf_counter() - started, errors[0]
+
+    def handle(self, *args, **options):
+        urls = self.urls()
+        default = connections['default'].settings_dict
+        original_age = default.get('CONN_MAX_AGE', 0)
+        persistent_age = original_age or 600
+        self.databases = dict(connections.databases)
+        modes = [
+            ('connection per request', 0, False),
+            ('persistent connections', persistent_age, False),
+        ]
+        if REPLICA_ALIAS in self.databases:
+            modes.append(('persistent + replica reads', persistent_age, True))
+
+        self.stdout.write(
+            f"{default['ENGINE'].rsplit('.', 1)[-1]} database, {len(urls)} URLs, "
+            f"{options['requests']} requests per mode on {options['threads']} threads"
+        )
+        try:
+            for label, age, replica in modes:
+                self.configure(age, replica)
+                # One warm-up pass so caches are equally hot in each mode.
+                self.run(urls, len(urls), 1, options['host'])
+                seconds, errors = self.run(urls, options['requests'], options['threads'], options['host'])
+                self.stdout.write(
+                    f"{label:<28} {options['requests'] / seconds:8.1f} req/s "
+                    f"{seconds / options['requests'] * 1000:7.2f} ms/req  errors={errors}"
+                )
+        finally:
+            self.configure(original_age, True)
+        self.stdout.write(self.style.SUCCESS("Benchmark complete."))
@@ -0,0 +1,46 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from portal.qr import RENDERERS, get_qr_image, qr_name
+
+
+class Command(BaseCommand):
+    help = "Time cold QR rendering against warm cache and storage reads, for PNG and SVG."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--url', default='https://example.com/confirm_return_by_qr/')
+
+    def timed(self, func, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations * 1000
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        token = uuid.uuid4()
+        url = f"{options['url']}{token}/"
+        for fmt, render in RENDERERS.items():
+            name = qr_name(token, url, fmt)
+            key = f'qr:{name}'
+            try:
+                size = len(get_qr_image(token, url, fmt))
+                cold = self.timed(lambda: render(url), iterations)
+                memory = self.timed(lambda: get_qr_image(token, url, fmt), iterations)
+
+                def from_storage():
+                    cache.delete(key)
+                    get_qr_image(token, url, fmt)
+                storage = self.timed(from_storage, iterations)
+            finally:
+                cache.delete(key)
+                default_storage.delete(name)
+            self.stdout.write(
+                f"{fmt}: {size} bytes, cold render {cold:.3f} ms, "
+                f"storage hit {storage:.3f} ms, cache hit {memory:.3f} ms"
+            )
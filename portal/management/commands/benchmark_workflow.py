@@ -0,0 +1,128 @@
+import json
+import logging
+import queue
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from portal.benchmark import WorkflowRunner, compare_to_baseline, local_gateway
+from portal.models import Item, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Run complete loans (browse, detail, borrow, approve, return, confirm, feedback) concurrently through "
+        "the real URLs and report p50/p95/p99 latency, requests per second and queries per request per view. "
+        "Payments go to a local gateway stand-in and mail to memory. Creates its own users and items."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workflows', type=int, default=100, help="Complete loans to run.")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--lenders', type=int, default=10)
+        parser.add_argument('--catalogue', type=int, default=200, help="Extra listed items to browse past.")
+        parser.add_argument('--paid-ratio', type=float, default=0.5, help="Share of loans that go through payment.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS.")
+        parser.add_argument('--save-baseline', metavar='PATH', help="Write the results to PATH as JSON.")
+        parser.add_argument('--baseline', metavar='PATH', help="Compare against results saved earlier.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Fractional latency/throughput slack before --baseline reports a regression.")
+        parser.add_argument('--keep', action='store_true', help="Leave the generated rows in place.")
+
+    def seed(self, options, prefix):
+        rng = random.Random(options['seed'])
+        lenders = User.objects.bulk_create(
+            User(username=f'{prefix}-lender-{n}', is_verified=True) for n in range(options['lenders'])
+        )
+        borrowers = User.objects.bulk_create(
+            User(username=f'{prefix}-borrower-{n}', is_verified=True) for n in range(options['workflows'])
+        )
+        categories = [value for value, label in Item.CATEGORY_CHOICES]
+
+        def make_item(name):
+            return Item(
+                name=name, category=rng.choice(categories), description='Benchmark item',
+                owner=rng.choice(lenders), borrowing_terms='Handle with care',
+                rental_fee=rng.choice((50, 100, 200)) if rng.random() < options['paid_ratio'] else 0,
+            )
+        Item.objects.bulk_create(make_item(f'{prefix} listing {n}') for n in range(options['catalogue']))
+        items = Item.objects.bulk_create(make_item(f'{prefix} loan {n}') for n in range(options['workflows']))
+        return [(item.owner, borrower, item) for item, borrower in zip(items, borrowers)]
+
+    def write_table(self, result):
+        self.stdout.write(f"{'view':<20}{'requests':>9}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for view, stats in result['views'].items():
+            self.stdout.write(
+                f"{view:<20}{stats['requests']:>9}{stats['errors']:>7}{stats['p50_ms']:>9.2f}"
+                f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['queries_per_request']:>9.2f}"
+            )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        jobs = queue.Queue()
+        for job in self.seed(options, prefix):
+            jobs.put(job)
+        runner = WorkflowRunner(options['host'])
+        # Per-request and per-gateway-call log lines would drown the report.
+        quiet = [logging.getLogger(name) for name in ('portal.queries', 'portal.payments')]
+        levels = [logger.level for logger in quiet]
+
+        def worker():
+            while True:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                runner.run_workflow(*job)
+
+        try:
+            for logger in quiet:
+                logger.setLevel(logging.WARNING)
+            with local_gateway() as gateway_settings, tempfile.TemporaryDirectory() as media_root, override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                MEDIA_ROOT=media_root,
+                **gateway_settings,
+            ):
+                threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                result = runner.summary(time.perf_counter() - started)
+        finally:
+            for logger, level in zip(quiet, levels):
+                logger.setLevel(level)
+            if not options['keep']:
+                # Items, loans, payments and notifications cascade with their users.
+                User.objects.filter(username__startswith=f'{prefix}-').delete()
+
+        self.write_table(result)
+        self.stdout.write(
+            f"{result['requests']} requests in {result['seconds']:.2f}s: {result['requests_per_second']:.1f} req/s, "
+            f"{result['failed_workflows']} of {options['workflows']} workflows failed"
+        )
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(f"Saved baseline to {options['save_baseline']}")
+        if baseline is not None:
+            regressions = compare_to_baseline(result, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write("No regressions against the baseline.")
+        self.stdout.write(self.style.SUCCESS("Benchmark complete."))
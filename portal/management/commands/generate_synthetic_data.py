@@ -0,0 +1,374 @@
+import itertools
+import random
+import time
+import uuid
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from portal.catalogue_cache import bump_catalogue_version
+from portal.geo import encode_geohash
+from portal.models import BorrowRecord, Feedback, Item, Notification, User
+from portal.search import get_search_backend
+
+DEFAULT_STATUS_MIX = 'RETURNED=70,CANCELLED=7,PENDING=8,ON_LOAN=10,AWAITING_DEPOSIT=2,RETURN_PENDING=3'
+DEFAULT_CATEGORY_MIX = 'Books=25,Notes=20,Electronics=18,Sports Equipment=12,Tools=10,Apparel=8,Other=7'
+
+# Loans in these statuses hold the item, so an item has at most one of them.
+ACTIVE_STATUSES = {'ON_LOAN', 'AWAITING_DEPOSIT', 'RETURN_PENDING'}
+
+# Star ratings lean positive, as they do on the live site.
+RATING_WEIGHTS = (3, 4, 10, 33, 50)
+
+ITEM_NAMES = {
+    'Books': ['Calculus Textbook', 'Physics Reference', 'Novel', 'Data Structures Book', 'Dictionary'],
+    'Notes': ['Semester Notes', 'Lab Manual', 'Exam Guide', 'Lecture Notes', 'Formula Sheet'],
+    'Electronics': ['Scientific Calculator', 'Arduino Kit', 'Headphones', 'Power Bank', 'Projector'],
+    'Sports Equipment': ['Cricket Bat', 'Football', 'Badminton Racket', 'Yoga Mat', 'Tennis Racket'],
+    'Tools': ['Drill', 'Screwdriver Set', 'Soldering Iron', 'Measuring Tape', 'Ladder'],
+    'Apparel': ['Lab Coat', 'Formal Blazer', 'Rain Jacket', 'Graduation Gown', 'Trekking Shoes'],
+    'Other': ['Camping Tent', 'Board Game', 'Umbrella', 'Cycle', 'Suitcase'],
+}
+ITEM_ADJECTIVES = ['Barely Used', 'Classic', 'Compact', 'Heavy Duty', 'Latest', 'Portable', 'Spare', 'Vintage']
+
+# City centres users are scattered around, so proximity search has clusters.
+LOCATIONS = [
+    ('Pune', 18.5204, 73.8567),
+    ('Mumbai', 19.0760, 72.8777),
+    ('Bengaluru', 12.9716, 77.5946),
+    ('Delhi', 28.7041, 77.1025),
+    ('Chennai', 13.0827, 80.2707),
+]
+
+
+def parse_mix(value, choices, option):
+    """Parse ``"A=70,B=30"`` into ``(keys, cumulative weights)``."""
+    keys, weights = [], []
+    for part in value.split(','):
+        key, _, weight = part.rpartition('=')
+        key = key.strip()
+        if key not in choices:
+            raise CommandError(f"{option}: unknown value {key!r}; choose from {', '.join(choices)}.")
+        try:
+            weights.append(float(weight))
+        except ValueError:
+            raise CommandError(f"{option}: {part!r} is not KEY=WEIGHT.")
+        keys.append(key)
+    if sum(weights) <= 0:
+        raise CommandError(f"{option}: weights must add up to more than zero.")
+    return keys, list(itertools.accumulate(weights))
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create write the given auto_now/auto_now_add fields instead of now()."""
+    flags = [
+        (field, flag) for model in models for field in model._meta.concrete_fields
+        for flag in ('auto_now', 'auto_now_add') if getattr(field, flag, False)
+    ]
+    for field, flag in flags:
+        setattr(field, flag, False)
+    try:
+        yield
+    finally:
+        for field, flag in flags:
+            setattr(field, flag, True)
+
+
+def next_pk(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with deterministic synthetic users, items, loans, feedback and notifications. "
+        "Rows are streamed in bulk_create batches with primary keys assigned up front, so foreign keys "
+        "never need a lookup. The same --seed and --until always produce the same rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--items', type=int, default=50000)
+        parser.add_argument('--loans', type=int, default=200000)
+        parser.add_argument('--notifications-per-loan', type=int, default=2)
+        parser.add_argument('--feedback-ratio', type=float, default=0.6,
+                            help="Share of returned loans that get a review.")
+        parser.add_argument('--read-ratio', type=float, default=0.9,
+                            help="Share of notifications already read.")
+        parser.add_argument('--lender-share', type=float, default=0.2, help="Share of users who list items.")
+        parser.add_argument('--lender-skew', type=float, default=1.1,
+                            help="Zipf exponent of items per lender; 0 spreads items evenly.")
+        parser.add_argument('--status-mix', default=DEFAULT_STATUS_MIX,
+                            help="Relative weights of BorrowRecord statuses, e.g. RETURNED=70,ON_LOAN=10.")
+        parser.add_argument('--category-mix', default=DEFAULT_CATEGORY_MIX,
+                            help="Relative weights of item categories.")
+        parser.add_argument('--days', type=int, default=365, help="Span of history to generate.")
+        parser.add_argument('--until', help="Last day of history as YYYY-MM-DD (default: today).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='password', help="Password of every generated user.")
+        parser.add_argument('--prefix', default='synth', help="Username prefix of generated users.")
+        parser.add_argument('--skip-search-index', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['items'] < 1:
+            raise CommandError("Need at least 2 users and 1 item.")
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.statuses, self.status_weights = parse_mix(
+            options['status_mix'], [value for value, label in BorrowRecord.STATUS_CHOICES], '--status-mix')
+        self.categories, self.category_weights = parse_mix(
+            options['category_mix'], [value for value, label in Item.CATEGORY_CHOICES], '--category-mix')
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError("--until must be YYYY-MM-DD.")
+        else:
+            until = datetime.combine(timezone.localdate(), datetime.min.time())
+        self.until = timezone.make_aware(until + timedelta(days=1))
+        self.start = self.until - timedelta(days=options['days'])
+        self.span = (self.until - self.start).total_seconds()
+
+        started = time.monotonic()
+        total = 0
+        with historical_timestamps(User, Item, BorrowRecord, Feedback, Notification):
+            total += self.stream(User, options['users'], self.users())
+            total += self.stream(Item, options['items'], self.items())
+            total += self.stream(BorrowRecord, options['loans'], self.loans())
+            total += self.stream(Feedback, len(self.reviews), self.feedback())
+            total += self.stream(Notification, options['loans'] * options['notifications_per_loan'],
+                                 self.notifications())
+        self.finish()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {total} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)."
+        ))
+
+    def moment(self, after=None):
+        """A random aware datetime in the history window, after ``after`` if given."""
+        low = (after - self.start).total_seconds() if after else 0.0
+        return self.start + timedelta(seconds=low + self.rng.random() * max(self.span - low, 0.0))
+
+    def stream(self, model, expected, rows):
+        """bulk_create ``rows`` in batches, one transaction each, with a progress line."""
+        batch_size = self.options['batch_size']
+        label = model._meta.verbose_name_plural
+        started = time.monotonic()
+        done = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=batch_size)
+            done += len(batch)
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f"\r{label}: {done:,}/{expected:,} rows, {rate:,.0f} rows/s", ending='')
+            self.stdout.flush()
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"\r{label}: {done:,} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)")
+        return done
+
+    def update_sql(self, model, fields):
+        quote = connection.ops.quote_name
+        assignments = ', '.join(f'{quote(model._meta.get_field(name).column)} = %s' for name in fields)
+        return f'UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s'
+
+    def users(self):
+        options, rng = self.options, self.rng
+        count = options['users']
+        self.user_base = next_pk(User)
+        password = make_password(options['password'])
+        # Counters kept in step with the feedback and notifications generated,
+        # written back in finish() instead of reconciled with aggregates.
+        self.ratings = [[0] * 6 for _ in range(count)]
+        self.unread = array('l', [0]) * count
+        self.user_location = array('b', [0]) * count
+        for n in range(count):
+            place = rng.randrange(len(LOCATIONS))
+            self.user_location[n] = place
+            name, lat, lng = LOCATIONS[place]
+            lat += rng.gauss(0, 0.08)
+            lng += rng.gauss(0, 0.08)
+            yield User(
+                pk=self.user_base + n,
+                username=f"{options['prefix']}{self.user_base + n}",
+                email=f"{options['prefix']}{self.user_base + n}@example.com",
+                password=password,
+                location=name,
+                latitude=lat,
+                longitude=lng,
+                geohash=encode_geohash(lat, lng),
+                is_verified=True,
+                date_joined=self.moment(),
+                verification_token=uuid.UUID(int=rng.getrandbits(128)),
+            )
+
+    def items(self):
+        options, rng = self.options, self.rng
+        count, users = options['items'], options['users']
+        self.item_base = next_pk(Item)
+        lenders = max(1, min(users, round(users * options['lender_share'])))
+        # Zipf weights: the lender at rank r lists about 1/r**skew as many items.
+        lender_weights = list(itertools.accumulate(1 / (rank ** options['lender_skew']) for rank in range(1, lenders + 1)))
+        owners = [bisect(lender_weights, rng.random() * lender_weights[-1]) for _ in range(count)]
+        self.item_owner = array('l', owners)
+        self.item_category = array('b', [0]) * count
+        self.item_period = array('b', [0]) * count
+        self.item_posted = array('d', [0.0]) * count
+        for n in range(count):
+            category = bisect(self.category_weights, rng.random() * self.category_weights[-1])
+            period = rng.choice((3, 7, 7, 14, 30))
+            posted = self.moment()
+            self.item_category[n] = category
+            self.item_period[n] = period
+            self.item_posted[n] = posted.timestamp()
+            fee = rng.choice((0, 0, 20, 50, 100, 250))
+            yield Item(
+                pk=self.item_base + n,
+                name=self.item_name(n),
+                category=self.categories[category],
+                description=f"{self.item_name(n)} available to borrow near {LOCATIONS[self.user_location[owners[n]]][0]}.",
+                owner_id=self.user_base + owners[n],
+                borrowing_terms=f"Free for {period} days" if not fee else f"Rs.{fee} for {period} days",
+                borrowing_period=period,
+                rental_fee=Decimal(fee),
+                deposit_amount=Decimal(rng.choice((0, 100, 500))),
+                date_posted=posted,
+                updated_at=posted,
+            )
+
+    def item_name(self, n):
+        nouns = ITEM_NAMES[self.categories[self.item_category[n]]]
+        return f"{ITEM_ADJECTIVES[n % len(ITEM_ADJECTIVES)]} {nouns[(n // len(ITEM_ADJECTIVES)) % len(nouns)]}"
+
+    def loans(self):
+        options, rng = self.options, self.rng
+        users, items = options['users'], options['items']
+        self.loan_base = next_pk(BorrowRecord)
+        self.active_items = set()
+        # (loan index, item index, borrower index, reviewed-at) of returned loans that get a review.
+        self.reviews = []
+        # Per loan: item, borrower and borrow time, for the notifications.
+        self.loan_item = array('l')
+        self.loan_borrower = array('l')
+        self.loan_time = array('d')
+        now = self.until
+        for n in range(options['loans']):
+            item = rng.randrange(items)
+            borrower = rng.randrange(users)
+            if borrower == self.item_owner[item]:
+                borrower = (borrower + 1) % users
+            status = self.statuses[bisect(self.status_weights, rng.random() * self.status_weights[-1])]
+            if status in ACTIVE_STATUSES and item in self.active_items:
+                status = 'RETURNED'
+            period = timedelta(days=self.item_period[item])
+            posted = datetime.fromtimestamp(self.item_posted[item], tz=now.tzinfo)
+
+            return_date = actual_return_date = None
+            if status in ACTIVE_STATUSES:
+                self.active_items.add(item)
+                borrowed = max(posted, now - period * rng.random())
+                return_date = borrowed + period
+            elif status == 'PENDING':
+                borrowed = max(posted, now - timedelta(days=3 * rng.random()))
+            else:
+                borrowed = self.moment(after=posted)
+                return_date = borrowed + period
+                if status == 'RETURNED':
+                    actual_return_date = min(borrowed + period * rng.uniform(0.3, 1.3), now)
+                    if rng.random() < options['feedback_ratio']:
+                        self.reviews.append((n, item, borrower, actual_return_date.timestamp()))
+
+            self.loan_item.append(item)
+            self.loan_borrower.append(borrower)
+            self.loan_time.append(borrowed.timestamp())
+            yield BorrowRecord(
+                pk=self.loan_base + n,
+                item_id=self.item_base + item,
+                borrower_id=self.user_base + borrower,
+                status=status,
+                borrow_date=borrowed,
+                return_date=return_date,
+                actual_return_date=actual_return_date,
+                return_token=uuid.UUID(int=rng.getrandbits(128)),
+                deposit_paid=status in ACTIVE_STATUSES and rng.random() < 0.5,
+            )
+
+    def feedback(self):
+        rng = self.rng
+        stars = list(itertools.accumulate(RATING_WEIGHTS))
+        tz = self.until.tzinfo
+        for loan, item, borrower, returned in self.reviews:
+            owner = self.item_owner[item]
+            rating = bisect(stars, rng.random() * stars[-1]) + 1
+            totals = self.ratings[owner]
+            totals[0] += 1
+            totals[rating] += 1
+            yield Feedback(
+                borrow_record_id=self.loan_base + loan,
+                reviewer_id=self.user_base + borrower,
+                reviewee_id=self.user_base + owner,
+                rating=rating,
+                comment=rng.choice(('', 'Smooth handover.', 'Item as described.', 'Returned on time.')),
+                created_at=datetime.fromtimestamp(returned, tz=tz) + timedelta(hours=rng.randint(1, 48)),
+            )
+
+    def notifications(self):
+        rng = self.rng
+        per_loan = self.options['notifications_per_loan']
+        read_ratio = self.options['read_ratio']
+        tz = self.until.tzinfo
+        for n, item in enumerate(self.loan_item):
+            borrower, owner = self.loan_borrower[n], self.item_owner[item]
+            borrowed = datetime.fromtimestamp(self.loan_time[n], tz=tz)
+            name = self.item_name(item)
+            messages = [
+                (owner, f"{self.options['prefix']}{self.user_base + borrower} has requested to borrow your item: {name}"),
+                (borrower, f"Your request for '{name}' has been approved."),
+            ]
+            for k in range(per_loan):
+                recipient, message = messages[k % len(messages)]
+                is_read = rng.random() < read_ratio
+                if not is_read:
+                    self.unread[recipient] += 1
+                yield Notification(
+                    recipient_id=self.user_base + recipient,
+                    message=message,
+                    is_read=is_read,
+                    timestamp=borrowed + timedelta(minutes=5 * k),
+                )
+
+    def finish(self):
+        """Write the tracked counters, flag lent-out items and rebuild derived data."""
+        # One prepared UPDATE per row via executemany; bulk_update's CASE
+        # expressions cost more than the inserts at this size.
+        counter_fields = ['unread_notifications_count', 'rating_count', 'rating_sum', 'average_rating',
+                          *(f'rating_{stars}_count' for stars in range(1, 6))]
+        counters = []
+        for n, totals in enumerate(self.ratings):
+            if not totals[0] and not self.unread[n]:
+                continue
+            rating_sum = sum(stars * totals[stars] for stars in range(1, 6))
+            average = round(rating_sum / totals[0], 2) if totals[0] else 0.0
+            counters.append((self.unread[n], totals[0], rating_sum, average, *totals[1:], self.user_base + n))
+        active = [(False, self.item_base + item) for item in sorted(self.active_items)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self.update_sql(User, counter_fields), counters)
+            cursor.executemany(self.update_sql(Item, ['is_available']), active)
+        self.stdout.write(f"Updated counters of {len(counters):,} users; {len(active):,} items are out on loan")
+
+        if not self.options['skip_search_index']:
+            started = time.monotonic()
+            count = get_search_backend().rebuild(batch_size=self.options['batch_size'])
+            self.stdout.write(f"Indexed {count:,} items for search in {time.monotonic() - started:.1f}s")
+        bump_catalogue_version()
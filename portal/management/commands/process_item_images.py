@@ -0,0 +1,49 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from portal.images import render_variants, save_variants
+from portal.models import Item
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for item images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes used for resizing and encoding.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help="Re-render items that already have variants.")
+
+    def pending(self, force, batch_size):
+        items = Item.objects.exclude(image='').exclude(image__isnull=True).values_list('pk', 'image', 'image_variants')
+        for pk, image, variants in items.iterator(chunk_size=batch_size):
+            if force or variants.get('source') != image:
+                yield pk, image
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        jobs = list(self.pending(options['force'], options['batch_size']))
+        done = failed = 0
+        # Forked or spawned workers must not share the parent's DB connection;
+        # they only touch storage, and results are saved from this process.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = {pool.submit(render_variants, image): (pk, image) for pk, image in jobs}
+            for future in as_completed(futures):
+                pk, image = futures[future]
+                try:
+                    save_variants(pk, image, future.result())
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"Item {pk} ({image}): {exc}")
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {done} images ({failed} failed) with {options['workers']} workers in {elapsed:.2f}s, {rate:.1f}/s."
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index used by the browse page."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help="Database alias to rebuild (defaults to the item database).")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        started = time.monotonic()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} items with {type(backend).__name__} in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user rating counts, sums, star histograms and averages from the feedback table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        repaired = reconcile_ratings(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Repaired rating aggregates of {repaired} users in {elapsed:.2f}s."))
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Repair per-user unread notification counters that drifted from the notifications table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        repaired = reconcile_unread_counts(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} unread counters in {elapsed:.2f}s."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from portal.reminders import send_loan_reminders
+
+
+class Command(BaseCommand):
+    help = "Notify borrowers and owners about loans that are due soon or overdue. Safe to run from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--due-soon-hours', type=int, default=24,
+                            help="Send a due-soon reminder this many hours before the return date.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        stats = send_loan_reminders(due_soon_hours=options['due_soon_hours'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {stats['scanned']} loans: {stats['overdue']} overdue and {stats['due_soon']} due-soon reminders, "
+            f"{stats['notifications']} notifications in {stats['seconds']:.2f}s."
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches over one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls when idle.")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = deliver_batch(batch_size=options['batch_size'])
+            if stats['claimed']:
+                self.stdout.write(
+                    f"Sent {stats['sent']}/{stats['claimed']} (retry {stats['retried']}, dead {stats['dead']}) "
+                    f"in {stats['seconds']:.2f}s, {stats['per_second']:.1f} msg/s."
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS("Outbox drained."))
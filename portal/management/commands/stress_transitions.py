@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Count, Q
+
+from portal import transitions
+from portal.models import BorrowRecord, Item, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Race concurrent approvals and return confirmations against the database and check that no "
+        "item is ever lent twice. Creates its own users and items and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--items', type=int, default=50)
+        parser.add_argument('--requests-per-item', type=int, default=4,
+                            help="Competing pending requests (and approvals) per item.")
+        parser.add_argument('--keep', action='store_true', help="Leave the generated rows in place.")
+
+    def race(self, jobs, threads):
+        """Run ``(func, record)`` jobs on ``threads`` threads; return (wins, retries, seconds)."""
+        work = queue.Queue()
+        for job in jobs:
+            work.put(job)
+        results = {'wins': 0, 'retries': 0}
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        func, record = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    while True:
+                        try:
+                            won = func(record)
+                            break
+                        except OperationalError:
+                            # SQLite reports lock contention as an error; try again.
+                            with lock:
+                                results['retries'] += 1
+                    with lock:
+                        results['wins'] += won
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return results['wins'], results['retries'], time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        owner = User.objects.create_user(username=f'stress-owner-{tag}')
+        borrowers = User.objects.bulk_create([
+            User(username=f'stress-borrower-{tag}-{i}') for i in range(options['requests_per_item'])
+        ])
+        try:
+            items = Item.objects.bulk_create([
+                Item(name=f'Stress item {i}', category='Other', description='', owner=owner, borrowing_terms='Free')
+                for i in range(options['items'])
+            ])
+            BorrowRecord.objects.bulk_create([
+                BorrowRecord(item=item, borrower=borrower, status='PENDING')
+                for item in items for borrower in borrowers
+            ])
+            records = list(BorrowRecord.objects.filter(item__owner=owner).select_related('item'))
+            self.report('approve', *self.race([(transitions.approve, record) for record in records], options['threads']),
+                        attempts=len(records))
+
+            self.check_no_double_lending(owner)
+            on_loan = list(BorrowRecord.objects.filter(item__owner=owner, status='ON_LOAN').select_related('item'))
+            for record in on_loan:
+                transitions.mark_returned(record)
+            # Two confirmations race for every return; exactly one may win.
+            jobs = [(transitions.confirm_return, BorrowRecord.objects.select_related('item').get(pk=record.pk))
+                    for record in on_loan for _ in range(2)]
+            wins, retries, seconds = self.race(jobs, options['threads'])
+            self.report('confirm_return', wins, retries, seconds, attempts=len(jobs))
+            if wins != len(on_loan):
+                raise CommandError(f"{wins} return confirmations won for {len(on_loan)} loans.")
+            if Item.objects.filter(owner=owner, is_available=False).exists():
+                raise CommandError("Returned items were left unavailable.")
+            self.stdout.write(self.style.SUCCESS(f"No double lending on {connection.vendor}."))
+        finally:
+            if not options['keep']:
+                User.objects.filter(pk__in=[owner.pk, *(b.pk for b in borrowers)]).delete()
+
+    def check_no_double_lending(self, owner):
+        items = Item.objects.filter(owner=owner).annotate(loans=Count('borrow_records', filter=Q(borrow_records__status='ON_LOAN')))
+        if items.filter(loans__gt=1).exists():
+            raise CommandError("An item was lent to more than one borrower.")
+        if items.filter(Q(loans=1, is_available=True) | Q(loans=0, is_available=False)).exists():
+            raise CommandError("Item availability disagrees with its loans.")
+        unlent = items.filter(loans=0).count()
+        if unlent:
+            raise CommandError(f"{unlent} items were never lent.")
+
+    def report(self, name, wins, retries, seconds, attempts):
+        rate = attempts / seconds if seconds else 0.0
+        self.stdout.write(
+            f"{name}: {attempts} attempts, {wins} won, {retries} lock retries in {seconds:.2f}s "
+            f"({rate:.0f} transitions/s)"
+        )
@@ -0,0 +1,86 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .assets import serve_asset
+
+logger = logging.getLogger('portal.queries')
+
+
+class QueryRecorder:
+    """Database execute wrapper that tallies the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Number of executions that repeated an SQL statement already seen."""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+
+class QueryCountMiddleware:
+    """Record query count, DB time and duplicated SQL for every request.
+
+    With DEBUG on the figures are returned as ``X-DB-*`` response headers;
+    otherwise one log line per request is written to ``portal.queries``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        if settings.DEBUG:
+            response['X-DB-View'] = view_name
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Query-Time-Ms'] = f'{recorder.duration * 1000:.1f}'
+            response['X-DB-Duplicate-Queries'] = str(recorder.duplicates)
+        else:
+            logger.info(
+                'view=%s status=%s queries=%d db_ms=%.1f duplicates=%d',
+                view_name, response.status_code, recorder.count, recorder.duration * 1000, recorder.duplicates,
+            )
+        return response
+
+
+class StaticAssetMiddleware:
+    """Serve collected static files ahead of the rest of the stack.
+
+    Requests under STATIC_URL that match a file in STATIC_ROOT are answered
+    by ``portal.assets.serve_asset`` without touching sessions or the
+    database; anything else falls through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+
+    def __call__(self, request):
+        if settings.STATIC_ROOT and request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = serve_asset(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS portal_item_fts USING fts5("
+    "name, description, category, location, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+MYSQL_CREATE = (
+    "CREATE TABLE IF NOT EXISTS portal_item_fts ("
+    "item_id BIGINT NOT NULL PRIMARY KEY, "
+    "name VARCHAR(200) NOT NULL, "
+    "description LONGTEXT NOT NULL, "
+    "category VARCHAR(50) NOT NULL, "
+    "location VARCHAR(100) NOT NULL, "
+    "FULLTEXT KEY portal_item_fts_all (name, description, category, location), "
+    "FULLTEXT KEY portal_item_fts_location (location)"
+    ") ENGINE=InnoDB"
+)
+
+POPULATE_COLUMNS = {
+    'sqlite': 'rowid, name, description, category, location',
+    'mysql': 'item_id, name, description, category, location',
+}
+
+POPULATE_SELECT = (
+    "SELECT i.id, i.name, i.description, i.category, COALESCE(u.location, '') "
+    "FROM portal_item i INNER JOIN portal_user u ON u.id = i.owner_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'mysql':
+        schema_editor.execute(MYSQL_CREATE)
+    else:
+        return
+    schema_editor.execute(
+        f"INSERT INTO portal_item_fts ({POPULATE_COLUMNS[vendor]}) {POPULATE_SELECT}"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in POPULATE_COLUMNS:
+        schema_editor.execute("DROP TABLE IF EXISTS portal_item_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_item_borrowing_period'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_item_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['is_available', 'date_posted'], name='item_available_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['is_available', 'category', 'date_posted'], name='item_avail_cat_posted_idx'),
+        ),
+    ]
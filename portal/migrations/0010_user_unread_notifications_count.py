@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_unread_counts(apps, schema_editor):
+    User = apps.get_model('portal', 'User')
+    Notification = apps.get_model('portal', 'Notification')
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .values('recipient')
+        .annotate(total=Count('pk'))
+        .values_list('recipient', 'total')
+    )
+    for user_id, total in unread:
+        User.objects.filter(pk=user_id).update(unread_notifications_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0009_user_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0010_user_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['borrower', 'borrow_date'], name='record_borrower_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['owner', 'date_posted'], name='item_owner_posted_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-17 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    User = apps.get_model('portal', 'User')
+    Feedback = apps.get_model('portal', 'Feedback')
+    totals = Feedback.objects.order_by().values('reviewee').annotate(
+        rating_count=Count('pk'),
+        rating_sum=Sum('rating'),
+        **{f'rating_{stars}_count': Count('pk', filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    for row in totals:
+        user_id = row.pop('reviewee')
+        row['average_rating'] = round(row['rating_sum'] / row['rating_count'], 2)
+        User.objects.filter(pk=user_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0014_item_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0018_reservation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['reviewee', 'created_at'], name='feedback_reviewee_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:36
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing items haven't changed since they were posted as far as we know.
+    Item = apps.get_model('portal', 'Item')
+    Item.objects.update(updated_at=F('date_posted'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0019_feedback_reviewee_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,65 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.utils import timezone
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
+from .geo import encode_geohash
 
 class User(AbstractUser):
     """Custom user model to add profile-specific fields."""
     average_rating = models.FloatField(default=0.0)
     location = models.CharField(max_length=100, blank=True, null=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # Derived from latitude/longitude on save; used for proximity prefiltering.
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)
     is_verified = models.BooleanField(default=False)
+    # Denormalized count of unread notifications, kept in step by portal.notifications.
+    unread_notifications_count = models.PositiveIntegerField(default=0, editable=False)
+    # Running feedback aggregates kept by portal.ratings; average_rating is
+    # derived from them in the same transaction.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
     verification_token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
+    # Counters maintained with atomic UPDATEs; a plain save() of a possibly
+    # stale instance must not write them back.
+    COUNTER_FIELDS = (
+        'unread_notifications_count', 'average_rating', 'rating_count', 'rating_sum',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        elif update_fields is None and not self._state.adding and self.pk is not None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        """``(stars, count, percent)`` for 5 down to 1 stars, from the counters."""
+        return [
+            (stars, count, round(100 * count / self.rating_count) if self.rating_count else 0)
+            for stars in range(5, 0, -1)
+            for count in [getattr(self, f'rating_{stars}_count')]
+        ]
+
 class Item(models.Model):
     """Represents an item that can be borrowed or lent."""
     CATEGORY_CHOICES = [
@@ -27,6 +76,11 @@ class Item(models.Model):
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     description = models.TextField()
     image = models.ImageField(upload_to='item_images/', null=True, blank=True)
+    # Filled in by portal.images after upload: original size and resized
+    # copies, {'webp': {'320': path, ...}, 'jpeg': {...}, 'source': image.name}.
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='lended_items')
     borrowing_terms = models.CharField(max_length=255, help_text="e.g., Free for 1 week, Rs.500.00 deposit required")
     deposit_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Security deposit amount (e.g., 500.00)")
@@ -34,10 +88,51 @@ class Item(models.Model):
     borrowing_period = models.PositiveIntegerField(default=7, help_text="Maximum borrowing period in days (e.g., 7)")
     is_available = models.BooleanField(default=True)
     date_posted = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save and by the update() calls that change what the
+    # item page shows; part of the page's ETag.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Newest-first listings of available items (home, browse).
+            models.Index(fields=['is_available', 'date_posted'], name='item_available_posted_idx'),
+            models.Index(fields=['is_available', 'category', 'date_posted'], name='item_avail_cat_posted_idx'),
+            # Lender dashboards join borrow records through the owner's items.
+            models.Index(fields=['owner', 'date_posted'], name='item_owner_posted_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def has_image_variants(self):
+        return bool(self.image) and self.image_variants.get('source') == self.image.name
+
+    def image_srcset(self, fmt):
+        variants = self.image_variants.get(fmt, {}) if self.has_image_variants else {}
+        return ', '.join(
+            f'{default_storage.url(path)} {width}w'
+            for width, path in sorted(variants.items(), key=lambda pair: int(pair[0]))
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.image_srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.image_srcset('jpeg')
+
+    @property
+    def thumbnail_url(self):
+        """Smallest processed JPEG, or the original while processing is pending."""
+        if not self.image:
+            return ''
+        variants = self.image_variants.get('jpeg', {}) if self.has_image_variants else {}
+        if not variants:
+            return self.image.url
+        return default_storage.url(variants[min(variants, key=int)])
+
 class BorrowRecord(models.Model):
     """Acts as a transaction log for borrowing activities."""
     STATUS_CHOICES = [
@@ -49,6 +144,13 @@ class BorrowRecord(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
 
+    # Dashboard tabs; the first group is shown by default.
+    STATUS_GROUPS = {
+        'active': ['ON_LOAN', 'AWAITING_DEPOSIT', 'RETURN_PENDING'],
+        'pending': ['PENDING'],
+        'history': ['RETURNED', 'CANCELLED'],
+    }
+
     item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='borrow_records')
     borrower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='borrowed_records')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
@@ -64,10 +166,63 @@ class BorrowRecord(models.Model):
     razorpay_payment_signature = models.CharField(max_length=255, blank=True, null=True)
     deposit_paid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['borrower', 'borrow_date'], name='record_borrower_date_idx'),
+            # Reminder sweeps: loans in a status whose return date falls in a window.
+            models.Index(fields=['status', 'return_date'], name='record_status_return_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item.name} borrowed by {self.borrower.username}"
 
+class Reservation(models.Model):
+    """A booked date range for an item, first to last day inclusive."""
+    STATUS_CHOICES = [
+        ('CONFIRMED', 'Confirmed'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='reservations')
+    borrower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reservations')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='CONFIRMED')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Overlap probes: item = ? AND status = ? AND start_date <= ? AND
+            # end_date >= ?, answered from the index alone.
+            models.Index(fields=['item', 'status', 'start_date', 'end_date'], name='reservation_item_span_idx'),
+            models.Index(fields=['borrower', 'start_date'], name='reservation_borrower_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_date__gte=models.F('start_date')), name='reservation_dates_ordered'),
+        ]
+
+    def __str__(self):
+        return f"{self.item.name} reserved by {self.borrower.username} {self.start_date} to {self.end_date}"
+
+class LoanReminder(models.Model):
+    """A reminder already sent for a loan, so sweeps never send it twice."""
+    KIND_CHOICES = [
+        ('DUE_SOON', 'Due Soon'),
+        ('OVERDUE', 'Overdue'),
+    ]
+
+    borrow_record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['borrow_record', 'kind'], name='unique_loan_reminder'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} reminder for record {self.borrow_record_id}"
+
 class Feedback(models.Model):
     borrow_record = models.OneToOneField(BorrowRecord, on_delete=models.CASCADE, related_name='feedback')
     reviewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='given_feedback')
@@ -76,6 +231,12 @@ class Feedback(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Reviews on a public profile, newest first.
+            models.Index(fields=['reviewee', 'created_at'], name='feedback_reviewee_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Feedback for {self.borrow_record}"
 
@@ -86,5 +247,97 @@ class Notification(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     link = models.URLField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Inbox pages: a user's notifications newest first.
+            models.Index(fields=['recipient', 'timestamp'], name='notif_recipient_ts_idx'),
+            # Unread lookups and mark-all-read.
+            models.Index(fields=['recipient', 'is_read', 'timestamp'], name='notif_recipient_read_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.message}"
+
+class ArchivedNotification(models.Model):
+    """Read notification moved out of the live table by archive_notifications.
+
+    Keeps the original id, so re-running an interrupted batch is harmless.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_notifications')
+    message = models.TextField()
+    link = models.URLField(blank=True, null=True)
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived notification for {self.recipient_id}: {self.message}"
+
+class PaymentIntent(models.Model):
+    """Local record of a gateway order, written when the order is created.
+
+    Payment callbacks and webhooks are resolved from this row instead of
+    fetching the order back from the gateway.
+    """
+    PURPOSE_CHOICES = [
+        ('RENTAL', 'Rental Fee'),
+        ('DEPOSIT', 'Security Deposit'),
+    ]
+    STATUS_CHOICES = [
+        ('CREATED', 'Created'),
+        ('PAID', 'Paid'),
+        ('FAILED', 'Failed'),
+    ]
+
+    order_id = models.CharField(max_length=100, unique=True)
+    purpose = models.CharField(max_length=10, choices=PURPOSE_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='CREATED')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='payment_intents')
+    payer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payment_intents')
+    # Set for deposits up front, and for rentals once the borrow record exists.
+    borrow_record = models.ForeignKey(BorrowRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_intents')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='INR')
+    payment_id = models.CharField(max_length=100, blank=True, null=True, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_purpose_display()} {self.order_id} ({self.status})"
+
+class WebhookEvent(models.Model):
+    """Gateway webhook deliveries already processed, for de-duplication."""
+    event_id = models.CharField(max_length=100, unique=True)
+    event = models.CharField(max_length=50)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event} {self.event_id}"
+
+class OutboundEmail(models.Model):
+    """Email waiting in the outbox for the send_queued_mail worker."""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('SENT', 'Sent'),
+        ('DEAD', 'Dead Letter'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for due mail: status = QUEUED ordered by next_attempt_at.
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
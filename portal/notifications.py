@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import User, Notification, ArchivedNotification
+from .realtime import publish
+
+
+def adjust_unread_count(user_id, delta):
+    """Atomically add ``delta`` to a user's unread counter, never below zero."""
+    if delta:
+        User.objects.filter(pk=user_id).update(
+            unread_notifications_count=Greatest(F('unread_notifications_count') + delta, Value(0))
+        )
+
+
+def mark_all_read(user):
+    """Mark every unread notification of ``user`` as read and reset the counter."""
+    marked = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+    adjust_unread_count(user.pk, -marked)
+    user.unread_notifications_count = 0
+    if marked:
+        transaction.on_commit(lambda: publish(user.pk, 'unread', count=0))
+    return marked
+
+
+def mark_read(user, notification_id):
+    """Mark one of ``user``'s notifications read; returns False if it already was."""
+    marked = Notification.objects.filter(pk=notification_id, recipient=user, is_read=False).update(is_read=True)
+    if marked:
+        adjust_unread_count(user.pk, -1)
+        user.unread_notifications_count = max(user.unread_notifications_count - 1, 0)
+        transaction.on_commit(lambda: publish(user.pk, 'read', id=notification_id))
+    return bool(marked)
+
+
+def push_notification(notification):
+    """Stream a new notification to the recipient's open pages.
+
+    Clients bump their badge on each one; the absolute count is sent when a
+    stream connects and whenever everything is marked read.
+    """
+    transaction.on_commit(lambda: publish(
+        notification.recipient_id, 'notification',
+        id=notification.pk,
+        message=notification.message,
+        link=notification.link or '',
+        timestamp=notification.timestamp.isoformat(),
+    ))
+
+
+def reconcile_unread_counts(batch_size=1000):
+    """Recompute counters that drifted from the notifications table.
+
+    Returns the number of users whose counter was repaired.
+    """
+    actual = Subquery(
+        Notification.objects.filter(recipient=OuterRef('pk'), is_read=False)
+        .order_by()
+        .values('recipient')
+        .annotate(total=Count('pk'))
+        .values('total'),
+        output_field=IntegerField(),
+    )
+    drifted = (
+        User.objects.annotate(actual=Coalesce(actual, 0))
+        .filter(~Q(unread_notifications_count=F('actual')))
+        .values_list('pk', 'actual')
+    )
+    repaired = 0
+    for user_id, count in drifted.iterator(chunk_size=batch_size):
+        User.objects.filter(pk=user_id).update(unread_notifications_count=count)
+        repaired += 1
+    return repaired
+
+
+def archive_notifications(older_than_days=None, batch_size=1000):
+    """Move read notifications older than the retention period to the archive.
+
+    Works through the table in primary-key order, one short transaction per
+    batch, so the live table is never locked for long. Returns the number
+    of notifications archived.
+    """
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    expired = Notification.objects.filter(is_read=True, timestamp__lt=cutoff).order_by('pk')
+    archived, last_pk = 0, 0
+    while True:
+        batch = list(expired.filter(pk__gt=last_pk).values('pk', 'recipient_id', 'message', 'link', 'timestamp')[:batch_size])
+        if not batch:
+            return archived
+        last_pk = batch[-1]['pk']
+        ids = [row['pk'] for row in batch]
+        with transaction.atomic():
+            ArchivedNotification.objects.bulk_create(
+                [ArchivedNotification(id=row['pk'], recipient_id=row['recipient_id'], message=row['message'],
+                                      link=row['link'], timestamp=row['timestamp']) for row in batch],
+                ignore_conflicts=True,
+            )
+            archived += Notification.objects.filter(pk__in=ids).delete()[0]
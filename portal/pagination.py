@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# How long an approximate listing total is reused before it is recounted.
+COUNT_CACHE_TIMEOUT = 300
+
+# Largest ?page_size= the API accepts.
+API_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(position, direction):
+    """Pack a ``(datetime, id)`` position into an opaque URL-safe token."""
+    payload = json.dumps([position[0].isoformat(), position[1], direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``((datetime, id), direction)`` for a token, or ``None`` if it is invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = (parse_datetime(value), int(pk))
+    except (ValueError, TypeError):
+        return None
+    if position[0] is None or direction not in ('next', 'prev'):
+        return None
+    return position, direction
+
+
+class CursorPage:
+    """One page of a keyset-paginated listing."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate a queryset newest first on ``(field, id)`` without COUNT or OFFSET.
+
+    Each page is a single indexed range scan starting after (or before) the
+    position stored in the cursor, so deep pages cost the same as the first.
+    """
+
+    def __init__(self, queryset, per_page, field='date_posted'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def position(self, obj):
+        return getattr(obj, self.field), obj.pk
+
+    def page(self, token=None):
+        cursor = decode_cursor(token)
+        field = self.field
+        if cursor is None:
+            rows = list(self.queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            (value, pk), direction = cursor
+            if direction == 'next':
+                after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                rows = list(self.queryset.filter(after).order_by(f'-{field}', '-pk')[:self.per_page + 1])
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                before = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                rows = list(self.queryset.filter(before).order_by(field, 'pk')[:self.per_page + 1])
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        next_cursor = encode_cursor(self.position(rows[-1]), 'next') if rows and has_next else None
+        previous_cursor = encode_cursor(self.position(rows[0]), 'prev') if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def cached_count(queryset, key, timeout=COUNT_CACHE_TIMEOUT):
+    """Return ``queryset.count()``, reusing a cached value for ``timeout`` seconds."""
+    cache_key = 'count:' + hashlib.md5(key.encode()).hexdigest()
+    return cache.get_or_set(cache_key, queryset.count, timeout)
+
+
+class KeysetCursorPagination(BasePagination):
+    """DRF pagination class backed by :class:`KeysetPaginator`, for portal.api.
+
+    Views name the timestamp they are ordered by in ``cursor_field``; the
+    page size can be lowered or raised up to ``API_MAX_PAGE_SIZE`` with
+    ``?page_size=``.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(size, 1), API_MAX_PAGE_SIZE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field = getattr(view, 'cursor_field', 'date_posted')
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), field)
+        self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
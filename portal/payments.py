@@ -0,0 +1,299 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import razorpay
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from . import transitions
+from .models import BorrowRecord, Notification, PaymentIntent, WebhookEvent
+
+logger = logging.getLogger('portal.payments')
+
+
+class PaymentGatewayError(Exception):
+    """Raised when the payment gateway cannot be reached or keeps failing."""
+
+
+class GatewayUnavailable(PaymentGatewayError):
+    """Raised without calling the gateway while the circuit breaker is open."""
+
+
+class TimeoutSession(requests.Session):
+    """A requests session with pooled connections and a default timeout.
+
+    The Razorpay SDK never passes a timeout, so without this a stalled
+    gateway would hold the worker thread indefinitely.
+    """
+
+    def __init__(self, timeout, pool_size):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class CircuitBreaker:
+    """Fail fast after repeated gateway failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds; then a single trial call
+    is let through, which closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_in_flight):
+                raise GatewayUnavailable("Payment gateway is temporarily unavailable.")
+            if state == 'half-open':
+                self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+# Errors that say the gateway itself is unhealthy. Client errors such as
+# BadRequestError or a bad signature do not trip the breaker.
+GATEWAY_FAILURES = (requests.RequestException, razorpay.errors.ServerError, razorpay.errors.GatewayError)
+
+
+class PaymentGateway:
+    """Razorpay client wrapper shared by every request in the process."""
+
+    def __init__(self, key_id, key_secret, base_url=None, connect_timeout=3.05, read_timeout=10.0,
+                 max_retries=2, retry_backoff=0.2, pool_size=10, breaker=None):
+        self.session = TimeoutSession((connect_timeout, read_timeout), pool_size)
+        options = {'base_url': base_url} if base_url else {}
+        self.client = razorpay.Client(session=self.session, auth=(key_id, key_secret), **options)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics_lock = threading.Lock()
+        self.latencies = defaultdict(lambda: {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+
+    def call(self, name, func, *args, idempotent=False):
+        """Run one gateway operation with the breaker, retries and metrics.
+
+        Only ``idempotent`` operations are retried, so an order is never
+        created twice because a response was lost.
+        """
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        for attempt in range(1, attempts + 1):
+            self.breaker.before_call()
+            started = time.perf_counter()
+            try:
+                result = func(*args)
+            except GATEWAY_FAILURES as exc:
+                self.record(name, started, failed=True)
+                self.breaker.record_failure()
+                logger.warning('gateway call %s failed (attempt %d/%d): %s', name, attempt, attempts, exc)
+                if attempt == attempts:
+                    raise PaymentGatewayError(f"Payment gateway error: {exc}") from exc
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            except Exception:
+                self.record(name, started, failed=True)
+                self.breaker.record_success()
+                raise
+            else:
+                self.record(name, started, failed=False)
+                self.breaker.record_success()
+                return result
+
+    def record(self, name, started, failed):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.metrics_lock:
+            stats = self.latencies[name]
+            stats['calls'] += 1
+            stats['errors'] += int(failed)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        logger.info('gateway call=%s ms=%.1f failed=%s', name, elapsed_ms, failed)
+
+    def metrics(self):
+        """Return per-operation call counts, errors and latency in milliseconds."""
+        with self.metrics_lock:
+            return {
+                name: dict(stats, avg_ms=stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0)
+                for name, stats in self.latencies.items()
+            }
+
+    def create_order(self, data):
+        return self.call('order.create', self.client.order.create, data)
+
+    def fetch_order(self, order_id):
+        return self.call('order.fetch', self.client.order.fetch, order_id, idempotent=True)
+
+    def verify_payment_signature(self, params):
+        # Pure HMAC check, no network round-trip.
+        return self.client.utility.verify_payment_signature(params)
+
+    def verify_webhook_signature(self, body, signature, secret):
+        return self.client.utility.verify_webhook_signature(body, signature, secret)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide payment gateway, creating it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = PaymentGateway(
+                    settings.RAZORPAY_KEY_ID,
+                    settings.RAZORPAY_KEY_SECRET,
+                    base_url=settings.RAZORPAY_BASE_URL,
+                    connect_timeout=settings.RAZORPAY_CONNECT_TIMEOUT,
+                    read_timeout=settings.RAZORPAY_READ_TIMEOUT,
+                    max_retries=settings.RAZORPAY_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.RAZORPAY_CIRCUIT_FAILURE_THRESHOLD,
+                        reset_timeout=settings.RAZORPAY_CIRCUIT_RESET_TIMEOUT,
+                    ),
+                )
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the shared gateway so the next call picks up current settings."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.session.close()
+        _gateway = None
+
+
+def start_payment(purpose, item, payer, amount, receipt, borrow_record=None, **extra):
+    """Create a gateway order and the local intent that callbacks resolve against."""
+    data = {
+        'amount': int(amount * 100),  # Amount in the smallest currency unit (paise)
+        'currency': 'INR',
+        'receipt': receipt,
+        'notes': {'item_id': item.id, 'user_id': payer.id, 'purpose': purpose},
+        **extra,
+    }
+    order = get_gateway().create_order(data)
+    PaymentIntent.objects.create(
+        order_id=order['id'],
+        purpose=purpose,
+        item=item,
+        payer=payer,
+        borrow_record=borrow_record,
+        amount=amount,
+        currency=data['currency'],
+    )
+    return order
+
+
+def complete_payment(order_id, payment_id, signature=None):
+    """Apply a successful payment to its intent exactly once.
+
+    Returns ``(intent, applied)``; ``applied`` is False when the payment was
+    already recorded by an earlier callback or webhook delivery. Raises
+    ``PaymentIntent.DoesNotExist`` for orders this site did not create.
+    """
+    with transaction.atomic():
+        intent = PaymentIntent.objects.select_related('item__owner', 'payer', 'borrow_record').get(order_id=order_id)
+        applied = PaymentIntent.objects.filter(pk=intent.pk).exclude(status='PAID').update(
+            status='PAID', payment_id=payment_id, paid_at=timezone.now(),
+        )
+        if not applied:
+            return intent, False
+
+        item, payer = intent.item, intent.payer
+        if intent.purpose == 'RENTAL':
+            record = BorrowRecord.objects.create(
+                item=item,
+                borrower=payer,
+                status='PENDING',  # Set status to PENDING for owner's approval
+                razorpay_order_id=order_id,
+                razorpay_payment_id=payment_id,
+                razorpay_payment_signature=signature,
+            )
+            PaymentIntent.objects.filter(pk=intent.pk).update(borrow_record=record)
+            intent.borrow_record = record
+            message = f"{payer.username} has paid the rental fee and requested to borrow your item: {item.name}"
+        elif intent.borrow_record_id is None:
+            # The loan was deleted after the deposit was requested; keep the
+            # payment on record and let the owner sort out a refund.
+            logger.warning('deposit %s paid for a deleted borrow record', order_id)
+            message = (
+                f"{payer.username} paid a security deposit of ₹{intent.amount} for your item {item.name}, "
+                f"but that loan no longer exists."
+            )
+        else:
+            BorrowRecord.objects.filter(pk=intent.borrow_record_id).update(
+                deposit_paid=True,
+                deposit_amount=intent.amount,
+                razorpay_payment_id=payment_id,
+                razorpay_payment_signature=signature,
+            )
+            # The loan resumes once the requested deposit is in.
+            transitions.deposit_paid(intent.borrow_record)
+            message = f"{payer.username} has paid the security deposit of ₹{intent.amount} for your item: {item.name}"
+
+        Notification.objects.create(recipient=item.owner, message=message, link=reverse('lended_items'))
+    return intent, True
+
+
+def handle_webhook_event(event_id, payload):
+    """Process one webhook delivery. Returns False for a duplicate delivery."""
+    event = payload.get('event', '')
+    payment = payload.get('payload', {}).get('payment', {}).get('entity', {})
+    event_id = event_id or f"{event}:{payment.get('id')}"
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                WebhookEvent.objects.create(event_id=event_id, event=event)
+        except IntegrityError:
+            return False
+
+        if event in ('payment.captured', 'order.paid') and payment.get('order_id'):
+            try:
+                complete_payment(payment['order_id'], payment['id'])
+            except PaymentIntent.DoesNotExist:
+                logger.warning('webhook %s for unknown order %s', event_id, payment['order_id'])
+        elif event == 'payment.failed' and payment.get('order_id'):
+            PaymentIntent.objects.filter(order_id=payment['order_id'], status='CREATED').update(status='FAILED')
+    return True
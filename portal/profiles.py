@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import BorrowRecord, Item, User
+
+# Summaries are invalidated on change; the timeout only bounds any drift
+# from writes that bypass the hooks (admin bulk actions, raw SQL).
+PROFILE_SUMMARY_TIMEOUT = 6 * 60 * 60
+
+
+def summary_key(user_id):
+    return f'profile:summary:{user_id}'
+
+
+def count_of(queryset, group_by):
+    """A correlated COUNT(*) of ``queryset`` usable as an annotation, 0 when empty."""
+    return Coalesce(
+        Subquery(queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')),
+        0,
+        output_field=IntegerField(),
+    )
+
+
+def profile_summary(user):
+    """Item and loan counts shown on a public profile.
+
+    Computed in one query and cached per user; the rating figures come from
+    the counters on the user row and are not part of it.
+    """
+    key = summary_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = User.objects.filter(pk=user.pk).values(
+            items_listed=count_of(Item.objects.filter(owner=OuterRef('pk')), 'owner'),
+            items_available=count_of(Item.objects.filter(owner=OuterRef('pk'), is_available=True), 'owner'),
+            loans_lent=count_of(
+                BorrowRecord.objects.filter(item__owner=OuterRef('pk'), status='RETURNED'), 'item__owner'),
+            loans_borrowed=count_of(
+                BorrowRecord.objects.filter(borrower=OuterRef('pk'), status='RETURNED'), 'borrower'),
+        ).get()
+        cache.set(key, summary, PROFILE_SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_profile_summary(*user_ids):
+    cache.delete_many([summary_key(user_id) for user_id in user_ids])
@@ -0,0 +1,104 @@
+import hashlib
+import io
+
+import qrcode
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Bump when the rendering below changes so stale images and ETags are dropped.
+QR_RENDER_VERSION = 1
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+def build_qr(data):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr
+
+
+def render_png(data):
+    img = build_qr(data).make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def render_svg(data):
+    """Render the code as one SVG path with a segment per horizontal run.
+
+    Written straight from the module matrix, so there is no raster and no
+    Pillow encode step, and the output scales to any print size.
+    """
+    matrix = build_qr(data).get_matrix()
+    size = len(matrix)
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                runs.append(f'M{start} {y}h{x - start}v1h-{x - start}z')
+            else:
+                x += 1
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" width="{size * 10}" '
+        f'height="{size * 10}" shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(runs)}"/></svg>'
+    ).encode()
+
+
+RENDERERS = {
+    'png': render_png,
+    'svg': render_svg,
+}
+
+
+def qr_name(token, url, fmt):
+    """Stable name for one token's QR image; the URL is part of the payload."""
+    digest = hashlib.sha256(f'{QR_RENDER_VERSION}:{url}'.encode()).hexdigest()[:16]
+    return f'qr/{token}-{digest}.{fmt}'
+
+
+def qr_etag(token, url, fmt):
+    # The image is a pure function of its name, so the name can be the ETag
+    # and a revalidation never has to load or render the image.
+    return '"%s"' % hashlib.sha256(qr_name(token, url, fmt).encode()).hexdigest()[:32]
+
+
+def get_qr_image(token, url, fmt='png'):
+    """Return the QR image bytes for a return token.
+
+    Looks in the cache, then in media storage, and renders only when both
+    miss. Whatever was missing is filled in on the way out.
+    """
+    name = qr_name(token, url, fmt)
+    key = f'qr:{name}'
+    data = cache.get(key)
+    if data is None:
+        if default_storage.exists(name):
+            with default_storage.open(name, 'rb') as stored:
+                data = stored.read()
+        else:
+            data = RENDERERS[fmt](url)
+            default_storage.save(name, ContentFile(data))
+        cache.set(key, data, None)
+    return data
+
+
+def pregenerate_qr_images(token, url):
+    """Render every format for a token ahead of the first request."""
+    for fmt in RENDERERS:
+        get_qr_image(token, url, fmt)
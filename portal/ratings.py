@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Greatest, Round
+
+from .models import User, Feedback
+
+STAR_FIELDS = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+
+
+def refresh_average(users):
+    users.update(average_rating=Round(
+        Cast(F('rating_sum'), FloatField()) / Greatest(F('rating_count'), Value(1)), 2,
+    ))
+
+
+def adjust_rating(user_id, rating, delta=1):
+    """Add (or with ``delta=-1`` remove) one rating from a user's aggregates.
+
+    Both UPDATEs run in one transaction, and the first one locks the row, so
+    the average always matches the counters even under concurrent reviews.
+    """
+    users = User.objects.filter(pk=user_id)
+    with transaction.atomic():
+        users.update(**{
+            'rating_count': Greatest(F('rating_count') + delta, Value(0)),
+            'rating_sum': Greatest(F('rating_sum') + delta * rating, Value(0)),
+            STAR_FIELDS[rating]: Greatest(F(STAR_FIELDS[rating]) + delta, Value(0)),
+        })
+        refresh_average(users)
+
+
+def reconcile_ratings(batch_size=1000):
+    """Recompute every user's rating aggregates from the feedback table.
+
+    Returns the number of users whose aggregates were repaired.
+    """
+    actual = {
+        row.pop('reviewee'): row
+        for row in Feedback.objects.order_by().values('reviewee').annotate(
+            rating_count=Count('pk'),
+            rating_sum=Sum('rating'),
+            **{field: Count('pk', filter=Q(rating=stars)) for stars, field in STAR_FIELDS.items()},
+        )
+    }
+    empty = dict.fromkeys(['rating_count', 'rating_sum', *STAR_FIELDS.values()], 0)
+    fields = [*empty, 'average_rating']
+    stale = []
+    for user in User.objects.only('pk', *fields).iterator(chunk_size=batch_size):
+        expected = dict(actual.get(user.pk, empty))
+        expected['average_rating'] = round(expected['rating_sum'] / expected['rating_count'], 2) if expected['rating_count'] else 0.0
+        if any(getattr(user, field) != expected[field] for field in fields):
+            for field in fields:
+                setattr(user, field, expected[field])
+            stale.append(user)
+    User.objects.bulk_update(stale, fields, batch_size=batch_size)
+    return len(stale)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Per-connection buffer; a client that falls this far behind misses events
+# until it reconnects, and the next unread count corrects its badge.
+QUEUE_SIZE = 100
+
+
+class Hub:
+    """In-process fan-out from published events to connected stream clients.
+
+    Each client is an ``asyncio.Queue`` on the server's event loop, so idle
+    connections cost a queue and a suspended coroutine, not a thread.
+    ``deliver`` may be called from any thread.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add((loop, queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self.lock:
+            clients = self.subscribers.get(user_id, set())
+            clients.difference_update({client for client in clients if client[1] is queue})
+            if not clients:
+                self.subscribers.pop(user_id, None)
+
+    def connection_count(self):
+        with self.lock:
+            return sum(len(clients) for clients in self.subscribers.values())
+
+    def deliver(self, user_id, event):
+        with self.lock:
+            clients = list(self.subscribers.get(user_id, ()))
+        for loop, queue in clients:
+            loop.call_soon_threadsafe(self.offer, queue, event)
+
+    @staticmethod
+    def offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+hub = Hub()
+
+
+class BaseBroker:
+    """Carries events between processes.
+
+    ``publish`` is called by whichever process created the event; a broker
+    must hand every event to ``hub.deliver`` in every process that serves
+    streams. Multi-process deployments point ``REALTIME_BROKER`` at a
+    subclass backed by e.g. Redis pub/sub or Postgres LISTEN/NOTIFY that
+    starts its listener in ``start``.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+
+class LocalBroker(BaseBroker):
+    """Delivers straight to this process's hub; for single-process servers."""
+
+    def publish(self, user_id, event):
+        self.hub.deliver(user_id, event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker configured by ``REALTIME_BROKER``."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                broker_class = import_string(getattr(settings, 'REALTIME_BROKER', 'portal.realtime.LocalBroker'))
+                _broker = broker_class(hub)
+                _broker.start()
+    return _broker
+
+
+def publish(user_id, event_type, **data):
+    get_broker().publish(user_id, {'type': event_type, **data})
+
+
+def format_event(event):
+    """Serialize an event in the Server-Sent Events wire format."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(user_id, unread_count, heartbeat=25):
+    """Yield a user's events as SSE frames until the client disconnects."""
+    get_broker()
+    queue = hub.subscribe(user_id)
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_event({'type': 'unread', 'count': unread_count})
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection.
+                yield ': ping\n\n'
+            else:
+                yield format_event(event)
+    finally:
+        hub.unsubscribe(user_id, queue)
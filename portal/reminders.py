@@ -0,0 +1,88 @@
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BorrowRecord, LoanReminder, Notification
+from .notifications import adjust_unread_count, push_notification
+
+# Statuses in which the item is with the borrower and a return date applies.
+ON_LOAN_STATUSES = ('ON_LOAN', 'AWAITING_DEPOSIT')
+
+
+def reminder_messages(record, kind):
+    """Return ``(borrower_message, owner_message)`` for one reminder."""
+    due = timezone.localtime(record.return_date).strftime('%d %b %Y')
+    item = record.item.name
+    if kind == 'DUE_SOON':
+        return (
+            f"Reminder: '{item}' is due back to {record.item.owner.username} on {due}.",
+            f"'{item}' lent to {record.borrower.username} is due back on {due}.",
+        )
+    return (
+        f"'{item}' was due back to {record.item.owner.username} on {due} and is now overdue.",
+        f"'{item}' lent to {record.borrower.username} was due back on {due} and is overdue.",
+    )
+
+
+def pending_reminders(kind, start, end):
+    """Loans whose return date is in ``[start, end)`` and lack a ``kind`` reminder."""
+    window = {'return_date__lt': end}
+    if start is not None:
+        window['return_date__gte'] = start
+    already_sent = LoanReminder.objects.filter(borrow_record=OuterRef('pk'), kind=kind)
+    return (
+        BorrowRecord.objects.filter(status__in=ON_LOAN_STATUSES, **window)
+        .filter(~Exists(already_sent))
+        .select_related('item__owner', 'borrower')
+        .order_by('return_date', 'pk')
+    )
+
+
+def send_batch(records, kind):
+    """Notify borrower and owner of each record and log the reminders, atomically."""
+    notifications = []
+    for record in records:
+        borrower_message, owner_message = reminder_messages(record, kind)
+        notifications.append(Notification(recipient=record.borrower, message=borrower_message, link=reverse('borrowed_items')))
+        notifications.append(Notification(recipient=record.item.owner, message=owner_message, link=reverse('lended_items')))
+    with transaction.atomic():
+        LoanReminder.objects.bulk_create([LoanReminder(borrow_record=record, kind=kind) for record in records])
+        Notification.objects.bulk_create(notifications)
+        # bulk_create sends no post_save, so do the signal handler's work here.
+        for recipient_id, count in Counter(n.recipient_id for n in notifications).items():
+            adjust_unread_count(recipient_id, count)
+        for notification in notifications:
+            push_notification(notification)
+    return len(notifications)
+
+
+def send_loan_reminders(due_soon_hours=24, batch_size=500, now=None):
+    """Send due-soon and overdue reminders that have not been sent yet.
+
+    Each pass reads at most ``batch_size`` records through the
+    ``(status, return_date)`` index; records drop out of the query once
+    their reminder is logged, so re-runs only touch new work. Returns
+    counts of rows scanned, reminders and notifications, and seconds taken.
+    """
+    started = time.perf_counter()
+    now = now or timezone.now()
+    windows = {
+        'OVERDUE': (None, now),
+        'DUE_SOON': (now, now + timedelta(hours=due_soon_hours)),
+    }
+    stats = Counter()
+    for kind, (start, end) in windows.items():
+        while True:
+            records = list(pending_reminders(kind, start, end)[:batch_size])
+            stats['scanned'] += len(records)
+            if not records:
+                break
+            stats[kind.lower()] += len(records)
+            stats['notifications'] += send_batch(records, kind)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
@@ -0,0 +1,98 @@
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .catalogue_cache import bump_catalogue_version
+from .models import BorrowRecord, Item, Notification, Reservation
+
+# Loans during which the item is away from its owner.
+ACTIVE_LOAN_STATUSES = ('ON_LOAN', 'AWAITING_DEPOSIT', 'RETURN_PENDING')
+
+
+class ReservationConflict(Exception):
+    """Raised when the requested dates overlap a loan or another reservation."""
+
+
+def overlapping_reservations(start, end):
+    # Two inclusive ranges overlap when each starts no later than the other ends.
+    return Reservation.objects.filter(status='CONFIRMED', start_date__lte=end, end_date__gte=start)
+
+
+def overlapping_loans(start):
+    """Active loans still out on ``start``.
+
+    Loans without a return date always are, and so are overdue ones: the
+    item hasn't come back, so nothing says it will by ``start``.
+    """
+    day_start = timezone.make_aware(datetime.combine(start, time.min))
+    return BorrowRecord.objects.filter(
+        Q(return_date__gte=day_start) | Q(return_date__isnull=True) | Q(return_date__lt=timezone.now()),
+        status__in=ACTIVE_LOAN_STATUSES,
+    )
+
+
+def free_between(items, start, end):
+    """Filter ``items`` to those with no reservation or loan between the dates.
+
+    Both checks are correlated NOT EXISTS probes, one short range scan per
+    candidate item on the reservation and ``(status, return_date)`` indexes.
+    """
+    return items.filter(
+        ~Exists(overlapping_reservations(start, end).filter(item=OuterRef('pk'))),
+        ~Exists(overlapping_loans(start).filter(item=OuterRef('pk'))),
+    )
+
+
+def booked_ranges(item, limit=10):
+    """Upcoming confirmed reservations of an item, soonest first."""
+    today = timezone.localdate()
+    return list(
+        Reservation.objects.filter(item=item, status='CONFIRMED', end_date__gte=today)
+        .order_by('start_date')[:limit]
+    )
+
+
+def reserve(item, borrower, start, end):
+    """Book ``item`` for ``borrower`` from ``start`` to ``end`` inclusive.
+
+    The item row is locked while checking for overlaps, so two concurrent
+    bookings of the same dates cannot both succeed.
+    """
+    with transaction.atomic():
+        Item.objects.select_for_update().filter(pk=item.pk).first()
+        if overlapping_reservations(start, end).filter(item=item).exists():
+            raise ReservationConflict("Those dates overlap an existing reservation.")
+        if overlapping_loans(start).filter(item=item).exists():
+            raise ReservationConflict("The item is on loan during those dates.")
+        reservation = Reservation.objects.create(item=item, borrower=borrower, start_date=start, end_date=end)
+        Notification.objects.create(
+            recipient=item.owner,
+            message=f"{borrower.username} has reserved your item '{item.name}' from {start} to {end}.",
+            link=reverse('item_detail', args=[item.pk]),
+        )
+    return reservation
+
+
+def cancel(reservation):
+    """Cancel a confirmed reservation; returns False if it already was."""
+    cancelled = Reservation.objects.filter(pk=reservation.pk, status='CONFIRMED').update(status='CANCELLED')
+    if cancelled:
+        # A queryset update sends no post_save, so invalidate listings here.
+        transaction.on_commit(bump_catalogue_version)
+        reservation.status = 'CANCELLED'
+    return bool(cancelled)
+
+
+def parse_date_range(start, end):
+    """Parse ``YYYY-MM-DD`` bounds into a date pair, or return ``None``."""
+    try:
+        start, end = parse_date(start or ''), parse_date(end or '')
+    except ValueError:
+        return None
+    if start is None or end is None or end < start:
+        return None
+    return start, end
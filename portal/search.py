@@ -0,0 +1,209 @@
+import re
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Item
+
+# Name of the search index table. On SQLite this is an FTS5 virtual table whose
+# rowid is the item id; on MySQL it is a regular table with FULLTEXT indexes.
+SEARCH_TABLE = 'portal_item_fts'
+
+# Upper bound on the number of ranked ids a single search returns.
+SEARCH_MAX_RESULTS = 500
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split free text into lowercase search terms."""
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def item_document(item):
+    """Return the fields of an item that are written to the search index."""
+    return {
+        'name': item.name or '',
+        'description': item.description or '',
+        'category': item.category or '',
+        'location': item.owner.location or '',
+    }
+
+
+class BaseSearchBackend:
+    """Common interface for the item search index."""
+
+    def __init__(self, using='default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def index_item(self, item):
+        raise NotImplementedError
+
+    def remove_item(self, item_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query='', location='', limit=SEARCH_MAX_RESULTS):
+        """Return item ids matching the query, best match first."""
+        raise NotImplementedError
+
+    def rebuild(self, batch_size=500):
+        """Re-index every item. Returns the number of items indexed."""
+        count = 0
+        with transaction.atomic(using=self.using):
+            self.clear()
+            items = Item.objects.using(self.using).select_related('owner').order_by('pk')
+            for item in items.iterator(chunk_size=batch_size):
+                self.index_item(item)
+                count += 1
+        return count
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Search backed by an SQLite FTS5 table ranked with bm25."""
+
+    # bm25 column weights for name, description, category, location.
+    WEIGHTS = (10.0, 2.0, 4.0, 1.0)
+
+    def index_item(self, item):
+        doc = item_document(item)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [item.pk])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, name, description, category, location) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [item.pk, doc['name'], doc['description'], doc['category'], doc['location']],
+            )
+
+    def remove_item(self, item_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [item_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def build_match(self, query, location):
+        # Every term is quoted so user input can never be parsed as FTS syntax,
+        # and given a trailing * so partially typed words still match.
+        clauses = [f'"{term}"*' for term in tokenize(query)]
+        clauses += [f'location : "{term}"*' for term in tokenize(location)]
+        return ' AND '.join(clauses)
+
+    def search(self, query='', location='', limit=SEARCH_MAX_RESULTS):
+        match = self.build_match(query, location)
+        if not match:
+            return []
+        weights = ', '.join(str(w) for w in self.WEIGHTS)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFullTextBackend(BaseSearchBackend):
+    """Search backed by InnoDB FULLTEXT indexes in boolean mode."""
+
+    COLUMNS = 'name, description, category, location'
+
+    def index_item(self, item):
+        doc = item_document(item)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'REPLACE INTO {SEARCH_TABLE} (item_id, name, description, category, location) '
+                'VALUES (%s, %s, %s, %s, %s)',
+                [item.pk, doc['name'], doc['description'], doc['category'], doc['location']],
+            )
+
+    def remove_item(self, item_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE item_id = %s', [item_id])
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def boolean_query(self, text):
+        return ' '.join(f'+{term}*' for term in tokenize(text))
+
+    def search(self, query='', location='', limit=SEARCH_MAX_RESULTS):
+        query_terms = self.boolean_query(query)
+        location_terms = self.boolean_query(location)
+        if not query_terms and not location_terms:
+            return []
+        where, params = [], []
+        if query_terms:
+            where.append(f'MATCH({self.COLUMNS}) AGAINST (%s IN BOOLEAN MODE)')
+            params.append(query_terms)
+        if location_terms:
+            where.append('MATCH(location) AGAINST (%s IN BOOLEAN MODE)')
+            params.append(location_terms)
+        score = where[0]
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT item_id FROM {SEARCH_TABLE} WHERE {" AND ".join(where)} '
+                f'ORDER BY {score} DESC LIMIT %s',
+                params + [params[0], limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Fallback for databases without a full-text engine; queries Item directly."""
+
+    def index_item(self, item):
+        pass
+
+    def remove_item(self, item_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self, batch_size=500):
+        return 0
+
+    def search(self, query='', location='', limit=SEARCH_MAX_RESULTS):
+        terms, location_terms = tokenize(query), tokenize(location)
+        if not terms and not location_terms:
+            return []
+        items = Item.objects.using(self.using)
+        for term in terms:
+            items = items.filter(
+                Q(name__icontains=term) | Q(description__icontains=term) | Q(category__icontains=term)
+            )
+        for term in location_terms:
+            items = items.filter(owner__location__icontains=term)
+        return list(items.order_by('-date_posted').values_list('pk', flat=True)[:limit])
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'mysql': MySQLFullTextBackend,
+}
+
+
+def get_search_backend(using=None):
+    """Return the search backend for the database that stores items.
+
+    ``settings.SEARCH_BACKEND`` may name a backend class explicitly; otherwise one
+    is picked from the database vendor.
+    """
+    using = using or router.db_for_write(Item)
+    backend_path = getattr(settings, 'SEARCH_BACKEND', None)
+    if backend_path:
+        backend_class = import_string(backend_path)
+    else:
+        backend_class = VENDOR_BACKENDS.get(connections[using].vendor, SimpleSearchBackend)
+    return backend_class(using=using)
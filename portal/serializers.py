@@ -0,0 +1,76 @@
+from rest_framework import serializers
+
+from .models import BorrowRecord, Item, Notification, User
+
+
+class SparseFieldsMixin:
+    """Drop every field not named in ``?fields=a,b``.
+
+    Unknown names are ignored, and a selection naming no known field keeps
+    them all.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        requested = {name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()}
+        if requested & set(self.fields):
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['username', 'location', 'average_rating']
+
+
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    owner = UserSummarySerializer(read_only=True)
+    image_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Item
+        fields = [
+            'id', 'name', 'category', 'description', 'owner', 'image_url', 'thumbnail_url',
+            'borrowing_terms', 'borrowing_period', 'rental_fee', 'deposit_amount', 'is_available', 'date_posted',
+        ]
+
+    def get_image_url(self, item):
+        return item.image.url if item.image else None
+
+
+class PublicProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    rating_histogram = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['username', 'location', 'date_joined', 'average_rating', 'rating_count', 'rating_histogram']
+
+    def get_rating_histogram(self, user):
+        return {stars: count for stars, count, percent in user.rating_histogram}
+
+
+class BorrowRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    item = serializers.SerializerMethodField()
+    borrower = serializers.CharField(source='borrower.username', read_only=True)
+    lender = serializers.CharField(source='item.owner.username', read_only=True)
+
+    class Meta:
+        model = BorrowRecord
+        fields = [
+            'id', 'item', 'borrower', 'lender', 'status', 'borrow_date', 'return_date', 'actual_return_date',
+            'deposit_amount', 'deposit_paid',
+        ]
+
+    def get_item(self, record):
+        return {'id': record.item_id, 'name': record.item.name}
+
+
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'message', 'link', 'is_read', 'timestamp']
@@ -0,0 +1,90 @@
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import User, Item, Notification, Feedback, Reservation
+from .search import get_search_backend
+from .catalogue_cache import bump_catalogue_version
+from .notifications import adjust_unread_count, push_notification
+from .ratings import adjust_rating
+from .images import schedule_item_image
+from .profiles import invalidate_profile_summary
+
+
+@receiver(post_save, sender=Item)
+def index_item_on_save(sender, instance, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    get_search_backend(using).index_item(instance)
+
+
+@receiver(post_save, sender=Item)
+def process_uploaded_image(sender, instance, raw=False, **kwargs):
+    # Resize new or replaced uploads after the transaction commits, off the
+    # request thread; the original is served until the variants exist.
+    if raw or not instance.image or instance.has_image_variants:
+        return
+    transaction.on_commit(lambda: schedule_item_image(instance))
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_from_index(sender, instance, using=None, **kwargs):
+    get_search_backend(using).remove_item(instance.pk)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def invalidate_catalogue_cache(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_owner_profile(sender, instance, **kwargs):
+    invalidate_profile_summary(instance.owner_id)
+
+
+@receiver(post_save, sender=User)
+def reindex_items_on_location_change(sender, instance, raw=False, created=False, update_fields=None, using=None, **kwargs):
+    # The owner's location is part of every item document, so re-index their
+    # items whenever it may have changed (but not on e.g. last_login updates).
+    if raw or created:
+        return
+    if update_fields is not None and 'location' not in update_fields:
+        return
+    backend = get_search_backend(using)
+    for item in Item.objects.using(using).filter(owner=instance):
+        item.owner = instance
+        backend.index_item(item)
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and not instance.is_read:
+        adjust_unread_count(instance.recipient_id, 1)
+        push_notification(instance)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_count(instance.recipient_id, -1)
+
+
+@receiver(post_save, sender=Feedback)
+def count_new_rating(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        adjust_rating(instance.reviewee_id, instance.rating)
+
+
+@receiver(post_delete, sender=Feedback)
+def uncount_deleted_rating(sender, instance, **kwargs):
+    adjust_rating(instance.reviewee_id, instance.rating, delta=-1)
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def invalidate_reviewee_profile(sender, instance, **kwargs):
+    invalidate_profile_summary(instance.reviewee_id)
@@ -1,8 +1,66 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import skipUnless
 
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
-from .models import User
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+
+from . import reservations, transitions, views
+from . import urls as portal_urls
+from .assets import CompressedManifestStaticFilesStorage, brotli, minify_css
+from .benchmark import compare_to_baseline, percentile
+from .catalogue_cache import cache_stats, reset_stats
+from .db import ReadReplicaRouter, reading_from_replica, use_read_replica
+from .geo import encode_geohash, haversine_km, nearby_items
+from .mail import deliver_batch, enqueue_email
+from .models import (
+    User, Item, BorrowRecord, Feedback, Notification, PaymentIntent, WebhookEvent, OutboundEmail, ArchivedNotification,
+    LoanReminder, Reservation,
+)
+from .pagination import KeysetPaginator
+from .payments import CircuitBreaker, GatewayUnavailable, PaymentGateway, PaymentGatewayError, get_gateway, reset_gateway
+from .profiles import profile_summary
+from .qr import qr_name
+from .realtime import event_stream, hub, publish
+from .search import get_search_backend
+
+# Keep per-request query and gateway logging out of the test output.
+logging.getLogger('portal.queries').setLevel(logging.WARNING)
+logging.getLogger('portal.payments').setLevel(logging.ERROR)
+logging.getLogger('portal.mail').setLevel(logging.CRITICAL)
+
 
 class UserVerificationTest(TestCase):
     def setUp(self):
@@ -13,7 +71,7 @@ class UserVerificationTest(TestCase):
         response = self.client.post(reverse('signup'), {
             'username': 'testuser',
             'email': 'test@example.com',
-            'password': 'testpassword123',
+            'password1': 'testpassword123',
             'password2': 'testpassword123',
         })
         
@@ -37,3 +95,1624 @@ class UserVerificationTest(TestCase):
         
         # Check that the user is logged in after verification
         self.assertEqual(int(response.wsgi_request.user.id), user.id)
+
+
+class ItemSearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.pune_owner = User.objects.create_user(username='pune_owner', password='pass12345', location='Pune, Maharashtra')
+        self.delhi_owner = User.objects.create_user(username='delhi_owner', password='pass12345', location='New Delhi')
+        self.calculator = Item.objects.create(
+            name='TI-84 Plus Calculator', category='Electronics', description='Graphing calculator',
+            owner=self.pune_owner, borrowing_terms='Free',
+        )
+        self.textbook = Item.objects.create(
+            name='Engineering Mathematics', category='Books', description='Covers calculator usage',
+            owner=self.delhi_owner, borrowing_terms='Free',
+        )
+
+    def test_search_ranks_name_matches_first(self):
+        ids = get_search_backend().search(query='calculator')
+        self.assertEqual(ids, [self.calculator.id, self.textbook.id])
+
+    def test_search_matches_prefixes_and_location(self):
+        self.assertEqual(get_search_backend().search(query='calc', location='pun'), [self.calculator.id])
+
+    def test_index_follows_item_and_owner_changes(self):
+        self.textbook.name = 'Physics Handbook'
+        self.textbook.save()
+        self.assertEqual(get_search_backend().search(query='physics'), [self.textbook.id])
+
+        self.delhi_owner.location = 'Mumbai'
+        self.delhi_owner.save()
+        self.assertEqual(get_search_backend().search(location='mumbai'), [self.textbook.id])
+
+        self.textbook.delete()
+        self.assertEqual(get_search_backend().search(query='physics'), [])
+
+    def test_browse_uses_search_parameters(self):
+        response = self.client.get(reverse('browse_items'), {'q': 'calculator', 'category': 'Books'})
+        self.assertEqual([item.id for item in response.context['items']], [self.textbook.id])
+
+        response = self.client.get(reverse('browse_items'), {'location': 'Pune'})
+        self.assertEqual([item.id for item in response.context['items']], [self.calculator.id])
+
+    def test_rebuild_command(self):
+        get_search_backend().clear()
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(len(get_search_backend().search(query='calculator')), 2)
+
+
+class BrowsePaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.items = [
+            Item.objects.create(name=f'Item {i}', category='Books' if i % 2 else 'Tools',
+                                description='Test item', owner=self.owner, borrowing_terms='Free')
+            for i in range(20)
+        ]
+        # Give half of the items identical timestamps to exercise the id tie-breaker.
+        Item.objects.filter(pk__in=[item.pk for item in self.items[:10]]).update(date_posted=self.items[0].date_posted)
+
+    def test_cursor_walk_visits_every_item_once(self):
+        expected = list(Item.objects.order_by('-date_posted', '-pk').values_list('pk', flat=True))
+        seen, cursor, pages = [], None, []
+        while True:
+            page = KeysetPaginator(Item.objects.filter(is_available=True), 8).page(cursor)
+            pages.append(page)
+            seen += [item.pk for item in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+        previous = KeysetPaginator(Item.objects.filter(is_available=True), 8).page(pages[-1].previous_cursor)
+        self.assertEqual([item.pk for item in previous], [item.pk for item in pages[-2]])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        page = KeysetPaginator(Item.objects.all(), 8).page('not-a-cursor')
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), 8)
+
+    def test_browse_listing_count_is_cached(self):
+        response = self.client.get(reverse('browse_items'), {'category': 'Books'})
+        self.assertEqual(response.context['total_count'], 10)
+        self.assertTrue(response.context['items'].has_next())
+
+        # A new listing page reuses the cached total instead of counting again.
+        with self.assertNumQueries(1):
+            self.client.get(reverse('browse_items'), {'category': 'Books', 'cursor': response.context['items'].next_cursor})
+
+
+class ProximitySearchTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        # Pune city centre, about 1.5km away in Shivajinagar, and Mumbai (~120km).
+        self.centre = (18.5204, 73.8567)
+        self.near_owner = User.objects.create_user(username='near', password='pass12345', latitude=18.5204, longitude=73.8567)
+        self.mid_owner = User.objects.create_user(username='mid', password='pass12345', latitude=18.5308, longitude=73.8475)
+        self.far_owner = User.objects.create_user(username='far', password='pass12345', latitude=19.0760, longitude=72.8777)
+        self.unplaced_owner = User.objects.create_user(username='unplaced', password='pass12345')
+        for owner in (self.far_owner, self.mid_owner, self.near_owner, self.unplaced_owner):
+            Item.objects.create(name=f'{owner.username} drill', category='Tools', description='Drill',
+                                owner=owner, borrowing_terms='Free')
+
+    def test_geohash_is_derived_on_save(self):
+        self.assertEqual(self.near_owner.geohash, encode_geohash(18.5204, 73.8567))
+        self.assertEqual(self.unplaced_owner.geohash, '')
+        self.unplaced_owner.latitude, self.unplaced_owner.longitude = 18.52, 73.85
+        self.unplaced_owner.save(update_fields=['latitude', 'longitude'])
+        self.unplaced_owner.refresh_from_db()
+        self.assertTrue(self.unplaced_owner.geohash.startswith('te'))
+
+    def test_haversine_distance(self):
+        self.assertAlmostEqual(haversine_km(18.5204, 73.8567, 19.0760, 72.8777), 119.4, delta=1.0)
+
+    def test_nearby_items_sorted_by_distance(self):
+        items = nearby_items(Item.objects.all(), self.centre, 5)
+        self.assertEqual([item.owner.username for item in items], ['near', 'mid'])
+        self.assertLess(items[0].distance_km, items[1].distance_km)
+
+        items = nearby_items(Item.objects.all(), self.centre, 150)
+        self.assertEqual([item.owner.username for item in items], ['near', 'mid', 'far'])
+
+    def test_browse_near_filter(self):
+        response = self.client.get(reverse('browse_items'), {'near': '18.5204,73.8567', 'radius': '1'})
+        self.assertEqual([item.owner.username for item in response.context['items']], ['near'])
+
+        self.client.force_login(self.mid_owner)
+        response = self.client.get(reverse('browse_items'), {'near': 'me', 'q': 'drill'})
+        self.assertEqual([item.owner.username for item in response.context['items']], ['mid', 'near'])
+
+
+class CatalogueCacheTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        reset_stats()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.item = Item.objects.create(name='Cricket Bat', category='Sports Equipment', description='Bat',
+                                        owner=self.owner, borrowing_terms='Free')
+
+    def test_home_featured_block_is_cached(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Catalogue-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Catalogue-Cache'], 'hit')
+        self.assertContains(response, 'Cricket Bat')
+
+    def test_item_save_invalidates_browse_pages(self):
+        self.client.get(reverse('browse_items'), {'category': 'Sports Equipment'})
+        response = self.client.get(reverse('browse_items'), {'category': 'Sports Equipment'})
+        self.assertEqual(response['X-Catalogue-Cache'], 'hit')
+
+        self.item.is_available = False
+        self.item.save()
+        response = self.client.get(reverse('browse_items'), {'category': 'Sports Equipment'})
+        self.assertEqual(response['X-Catalogue-Cache'], 'miss')
+        self.assertNotContains(response, 'Cricket Bat')
+        self.assertEqual(cache_stats()['browse:hit'], 1)
+        self.assertEqual(cache_stats()['browse:miss'], 2)
+
+    def test_item_cards_are_shared_between_pages(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('browse_items'))
+        self.assertEqual(cache_stats()['item_card:miss'], 1)
+        self.assertEqual(cache_stats()['item_card:hit'], 1)
+
+
+class UnreadNotificationCounterTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+
+    def test_counter_follows_create_read_and_delete(self):
+        for i in range(3):
+            Notification.objects.create(recipient=self.user, message=f'Message {i}')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 3)
+
+        Notification.objects.filter(recipient=self.user).first().delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 2)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('mark_all_notifications_read'), follow=True)
+        self.assertEqual(response.context['unread_notifications_count'], 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 0)
+
+    def test_context_processor_costs_no_query(self):
+        Notification.objects.create(recipient=self.user, message='Hello')
+        self.client.force_login(self.user)
+        with self.assertNumQueries(2):  # session + user, nothing else
+            response = self.client.get(reverse('about'))
+        self.assertEqual(response.context['unread_notifications_count'], 1)
+
+    def test_stale_user_save_keeps_counter(self):
+        stale = User.objects.get(pk=self.user.pk)
+        Notification.objects.create(recipient=self.user, message='Hello')
+        stale.first_name = 'Reader'
+        stale.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 1)
+        self.assertEqual(self.user.first_name, 'Reader')
+
+    def test_reconcile_command_repairs_drift(self):
+        Notification.objects.create(recipient=self.user, message='Hello')
+        User.objects.filter(pk=self.user.pk).update(unread_notifications_count=7)
+        out = io.StringIO()
+        call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Repaired 1', out.getvalue())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 1)
+
+
+class QueryBudgetMixin:
+    """Test helper that fails when a block issues more queries than allowed."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using='default'):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        if len(context) > budget:
+            statements = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(context.captured_queries, 1))
+            self.fail(f'{len(context)} queries executed, budget is {budget}:\n{statements}')
+
+
+class TempMediaMixin:
+    """Point MEDIA_ROOT at a throwaway directory for the test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = cls.settings_override = override_settings(MEDIA_ROOT=media_root)
+        overrides.enable()
+        cls.addClassCleanup(overrides.disable)
+
+
+class ViewQueryBudgetTest(TempMediaMixin, QueryBudgetMixin, TestCase):
+    """Every view in portal/urls.py has a query budget that must not regress.
+
+    Budgets include the session and user lookups of logged-in requests.
+    """
+
+    BUDGETS = {
+        'home': 1,
+        'browse_items': 2,
+        'verify_email': 11,
+        'signup': 0,
+        'signup:post': 4,
+        'login': 0,
+        'login:post': 10,
+        'logout': 4,
+        'profile': 2,
+        'add_item': 2,
+        'borrowed_items': 4,
+        'lended_items': 4,
+        'contact': 0,
+        'contact:post': 1,
+        'borrow_item': 7,
+        'approve_request': 11,
+        'reject_request': 6,
+        'item_detail': 3,
+        'reserve_item': 11,
+        'cancel_reservation': 4,
+        'mark_as_returned': 6,
+        'confirm_return': 9,
+        'generate_qr_code': 3,
+        'confirm_return_by_qr': 3,
+        'request_deposit': 6,
+        'pay_deposit': 3,
+        'payment_success': 8,
+        'razorpay_webhook': 13,
+        'transaction_history': 3,
+        'notifications': 5,
+        'notification_stream': 2,
+        'mark_notification_read': 5,
+        'mark_all_notifications_read': 5,
+        'leave_feedback': 4,
+        'terms': 0,
+        'privacy': 0,
+        'about': 0,
+        'faq': 0,
+        'settings': 2,
+        'public_profile': 6,
+    }
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        self.items = [
+            Item.objects.create(name=f'Item {i}', category='Books', description='Book', owner=self.owner,
+                                borrowing_terms='Free', deposit_amount=100)
+            for i in range(4)
+        ]
+        self.add_records(self.items)
+        self.pending = BorrowRecord.objects.filter(status='PENDING').first()
+        self.on_loan = BorrowRecord.objects.filter(status='ON_LOAN').first()
+        self.return_pending = BorrowRecord.objects.filter(status='RETURN_PENDING').first()
+        self.returned = BorrowRecord.objects.filter(status='RETURNED', feedback__isnull=True).first()
+
+    def add_records(self, items):
+        for item in items:
+            for status in ('PENDING', 'ON_LOAN', 'RETURN_PENDING', 'RETURNED'):
+                BorrowRecord.objects.create(item=item, borrower=self.borrower, status=status, deposit_paid=True)
+            reviewed = BorrowRecord.objects.create(item=item, borrower=self.borrower, status='RETURNED')
+            Feedback.objects.create(borrow_record=reviewed, reviewer=self.borrower, reviewee=self.owner, rating=4)
+            Notification.objects.create(recipient=self.owner, message=f'Update on {item.name}')
+            Notification.objects.create(recipient=self.borrower, message=f'Update on {item.name}')
+
+    def request(self, url_name, args=(), method='get', user=None, data=None, **extra):
+        if user:
+            self.client.force_login(user)
+        # Views whose POST does different work have their own 'name:post' budget.
+        budget = self.BUDGETS.get(f'{url_name}:{method}', self.BUDGETS[url_name])
+        with self.assertQueryBudget(budget):
+            return getattr(self.client, method)(reverse(url_name, args=args), data or {}, **extra)
+
+    def test_every_view_has_a_budget(self):
+        names = {pattern.name for pattern in portal_urls.urlpatterns}
+        self.assertEqual(names, {key.split(':')[0] for key in self.BUDGETS})
+
+    def test_public_pages(self):
+        for name in ('home', 'browse_items', 'signup', 'login', 'contact', 'terms', 'privacy', 'about', 'faq'):
+            with self.subTest(name=name):
+                self.assertEqual(self.request(name).status_code, 200)
+        self.assertEqual(self.request('item_detail', [self.items[0].pk]).status_code, 200)
+        self.assertEqual(self.request('public_profile', ['owner']).status_code, 200)
+        self.assertEqual(self.request('payment_success').status_code, 400)
+
+    def test_public_forms(self):
+        response = self.request('signup', method='post', data={
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password1': 'testpassword123', 'password2': 'testpassword123',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        response = self.request('login', method='post', data={'username': 'borrower', 'password': 'pass12345'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        response = self.request('contact', method='post', data={
+            'full_name': 'Visitor', 'email': 'visitor@example.com', 'subject': 'Hello', 'message': 'Hi there',
+        })
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_account_pages(self):
+        for name in ('profile', 'add_item', 'settings', 'borrowed_items', 'transaction_history', 'notifications'):
+            with self.subTest(name=name):
+                self.assertEqual(self.request(name, user=self.borrower).status_code, 200)
+        self.assertEqual(self.request('lended_items', user=self.owner).status_code, 200)
+
+    def test_payment_callbacks(self):
+        overrides = self.settings(RAZORPAY_KEY_ID='key_id', RAZORPAY_KEY_SECRET='key_secret',
+                                  RAZORPAY_WEBHOOK_SECRET='hook_secret', RAZORPAY_BASE_URL='http://127.0.0.1:9')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+
+        PaymentIntent.objects.create(order_id='order_r1', purpose='RENTAL', item=self.items[0], payer=self.borrower,
+                                     amount=50)
+        response = self.request('payment_success', method='post', data={
+            'razorpay_order_id': 'order_r1',
+            'razorpay_payment_id': 'pay_r1',
+            'razorpay_signature': sign('key_secret', 'order_r1|pay_r1'),
+        })
+        self.assertEqual(response.status_code, 200)
+
+        BorrowRecord.objects.filter(pk=self.on_loan.pk).update(status='AWAITING_DEPOSIT')
+        PaymentIntent.objects.create(order_id='order_d1', purpose='DEPOSIT', item=self.on_loan.item,
+                                     payer=self.borrower, borrow_record=self.on_loan, amount=100)
+        body = json.dumps({'event': 'payment.captured',
+                           'payload': {'payment': {'entity': {'id': 'pay_d1', 'order_id': 'order_d1'}}}})
+        response = self.request('razorpay_webhook', method='post', data=body, content_type='application/json',
+                                HTTP_X_RAZORPAY_SIGNATURE=sign('hook_secret', body), HTTP_X_RAZORPAY_EVENT_ID='evt_1')
+        self.assertEqual(response.json()['status'], 'success')
+        self.on_loan.refresh_from_db()
+        self.assertEqual(self.on_loan.status, 'ON_LOAN')
+
+    def test_dashboards_do_not_grow_with_rows(self):
+        self.add_records(self.items)
+        self.assertEqual(self.request('borrowed_items', user=self.borrower).status_code, 200)
+        self.assertEqual(self.request('lended_items', user=self.owner).status_code, 200)
+        self.assertEqual(self.request('transaction_history', user=self.borrower).status_code, 200)
+        self.assertEqual(self.request('public_profile', ['owner']).status_code, 200)
+
+    def test_lending_workflow(self):
+        free_item = Item.objects.create(name='Free', category='Books', description='Book', owner=self.owner, borrowing_terms='Free')
+        self.assertEqual(self.request('borrow_item', [free_item.pk], user=self.borrower).status_code, 302)
+        self.assertEqual(self.request('approve_request', [self.pending.pk], user=self.owner).status_code, 302)
+        other_pending = BorrowRecord.objects.filter(status='PENDING').first()
+        self.assertEqual(self.request('reject_request', [other_pending.pk]).status_code, 302)
+        self.assertEqual(self.request('request_deposit', [self.on_loan.pk]).status_code, 302)
+        self.assertEqual(self.request('generate_qr_code', [self.return_pending.pk]).status_code, 200)
+        self.assertEqual(self.request('confirm_return', [self.return_pending.pk]).status_code, 302)
+
+        on_loan = BorrowRecord.objects.filter(status='ON_LOAN').first()
+        self.assertEqual(self.request('mark_as_returned', [on_loan.pk], user=self.borrower).status_code, 302)
+        on_loan = BorrowRecord.objects.filter(status='ON_LOAN').first()
+        self.assertEqual(self.request('confirm_return_by_qr', [on_loan.return_token]).status_code, 200)
+        self.assertEqual(self.request('leave_feedback', [self.returned.pk]).status_code, 200)
+        free_record = BorrowRecord.objects.filter(item=free_item).first()
+        self.assertEqual(self.request('pay_deposit', [free_record.pk], method='post').status_code, 400)
+
+    def test_reservations(self):
+        start = timezone.localdate() + timedelta(days=30)
+        dates = {'start_date': start, 'end_date': start + timedelta(days=2)}
+        item = Item.objects.create(name='Tent', category='Sports Equipment', description='Tent', owner=self.owner,
+                                   borrowing_terms='Free')
+        self.assertEqual(self.request('reserve_item', [item.pk], 'post', self.borrower, dates).status_code, 302)
+        reservation = Reservation.objects.get()
+        self.assertEqual(self.request('cancel_reservation', [reservation.pk], 'post').status_code, 302)
+
+    def test_account_lifecycle(self):
+        self.assertEqual(self.request('logout', user=self.borrower).status_code, 302)
+        inactive = User.objects.create_user(username='new', password='pass12345', is_active=False)
+        self.assertEqual(self.request('verify_email', [inactive.verification_token]).status_code, 302)
+
+    def test_middleware_reports_queries(self):
+        with self.settings(DEBUG=True):
+            response = self.client.get(reverse('item_detail', args=[self.items[0].pk]))
+        self.assertEqual(response['X-DB-View'], 'item_detail')
+        self.assertEqual(response['X-DB-Query-Count'], '3')
+        self.assertIn('X-DB-Query-Time-Ms', response)
+
+        with self.assertLogs('portal.queries', level='INFO') as logs:
+            self.client.get(reverse('item_detail', args=[self.items[0].pk]))
+        self.assertIn('view=item_detail status=200 queries=3', logs.output[0])
+
+
+class DashboardTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        item = Item.objects.create(name='Racket', category='Sports Equipment', description='Racket',
+                                   owner=self.owner, borrowing_terms='Free')
+        statuses = ['ON_LOAN'] * 25 + ['PENDING'] * 2 + ['RETURNED'] * 3 + ['CANCELLED']
+        for status in statuses:
+            BorrowRecord.objects.create(item=item, borrower=self.borrower, status=status)
+
+    def test_default_tab_shows_open_loans_paginated(self):
+        self.client.force_login(self.borrower)
+        response = self.client.get(reverse('borrowed_items'))
+        self.assertEqual(response.context['status_group'], 'active')
+        self.assertEqual(response.context['status_tabs'], [('active', 25), ('pending', 2), ('history', 4)])
+        self.assertEqual(len(response.context['borrowed_records']), 20)
+        self.assertEqual(response.context['borrowed_records'].paginator.num_pages, 2)
+
+    def test_status_tabs(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('lended_items'), {'status': 'history'})
+        self.assertEqual({record.status for record in response.context['lended_records']}, {'RETURNED', 'CANCELLED'})
+        response = self.client.get(reverse('lended_items'), {'status': 'bogus'})
+        self.assertEqual(response.context['status_group'], 'active')
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the Razorpay orders API."""
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        server = self.server
+        server.hits.append((self.command, self.path))
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if server.delay:
+            time.sleep(server.delay)
+        if server.failures_left > 0:
+            server.failures_left -= 1
+            return self.respond(500, {'error': {'code': 'SERVER_ERROR', 'description': 'Gateway down'}})
+        if self.command == 'POST' and self.path == '/v1/orders':
+            return self.respond(200, {'id': 'order_stub1', 'amount': payload['amount'], 'currency': payload['currency'],
+                                      'notes': payload.get('notes', {})})
+        if self.command == 'GET' and self.path.startswith('/v1/orders/'):
+            return self.respond(200, {'id': self.path.rsplit('/', 1)[-1], 'notes': {}})
+        return self.respond(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Unknown path'}})
+
+    do_GET = do_POST = handle_request
+
+
+class PaymentGatewayTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGatewayHandler)
+        cls.server.daemon_threads = True
+        # Timed-out clients hang up mid-response; that is expected here.
+        cls.server.handle_error = lambda request, client_address: None
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.hits = []
+        self.server.delay = 0
+        self.server.failures_left = 0
+
+    def make_gateway(self, **kwargs):
+        options = {'base_url': self.base_url, 'read_timeout': 1.0, 'retry_backoff': 0}
+        options.update(kwargs)
+        return PaymentGateway('key_id', 'key_secret', **options)
+
+    def test_create_order_reuses_one_session_and_records_latency(self):
+        gateway = self.make_gateway()
+        for _ in range(3):
+            self.assertEqual(gateway.create_order({'amount': 5000, 'currency': 'INR'})['id'], 'order_stub1')
+        metrics = gateway.metrics()['order.create']
+        self.assertEqual((metrics['calls'], metrics['errors']), (3, 0))
+        self.assertGreater(metrics['avg_ms'], 0)
+
+    def test_idempotent_calls_are_retried(self):
+        self.server.failures_left = 2
+        gateway = self.make_gateway(max_retries=2)
+        self.assertEqual(gateway.fetch_order('order_abc')['id'], 'order_abc')
+        self.assertEqual(len(self.server.hits), 3)
+
+    def test_order_creation_is_not_retried(self):
+        self.server.failures_left = 1
+        gateway = self.make_gateway(max_retries=2)
+        with self.assertRaises(PaymentGatewayError):
+            gateway.create_order({'amount': 5000, 'currency': 'INR'})
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_read_timeout(self):
+        self.server.delay = 0.5
+        gateway = self.make_gateway(read_timeout=0.1, max_retries=0)
+        started = time.monotonic()
+        with self.assertRaises(PaymentGatewayError):
+            gateway.fetch_order('order_abc')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_circuit_breaker_fails_fast_then_recovers(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+        gateway = self.make_gateway(max_retries=0, breaker=breaker)
+        self.server.failures_left = 2
+        for _ in range(2):
+            with self.assertRaises(PaymentGatewayError):
+                gateway.fetch_order('order_abc')
+        with self.assertRaises(GatewayUnavailable):
+            gateway.fetch_order('order_abc')
+        self.assertEqual(len(self.server.hits), 2)
+
+        now[0] = 31.0
+        self.assertEqual(gateway.fetch_order('order_abc')['id'], 'order_abc')
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_borrow_view_uses_shared_gateway(self):
+        owner = User.objects.create_user(username='owner', password='pass12345')
+        borrower = User.objects.create_user(username='borrower', password='pass12345')
+        item = Item.objects.create(name='Camera', category='Electronics', description='DSLR', owner=owner,
+                                   borrowing_terms='Rs.50 per week', rental_fee=50)
+        self.client.force_login(borrower)
+        with self.settings(RAZORPAY_BASE_URL=self.base_url, RAZORPAY_KEY_ID='key_id', RAZORPAY_KEY_SECRET='secret'):
+            reset_gateway()
+            try:
+                response = self.client.get(reverse('borrow_item', args=[item.pk]))
+                self.assertIs(get_gateway(), get_gateway())
+            finally:
+                reset_gateway()
+        self.assertEqual(response.context['razorpay_order_id'], 'order_stub1')
+        self.assertEqual(self.server.hits, [('POST', '/v1/orders')])
+
+
+def sign(secret, message):
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+class PaymentIntentTest(TestCase):
+    SETTINGS = {'RAZORPAY_KEY_ID': 'key_id', 'RAZORPAY_KEY_SECRET': 'key_secret', 'RAZORPAY_WEBHOOK_SECRET': 'hook_secret',
+                'RAZORPAY_BASE_URL': 'http://127.0.0.1:9'}
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        self.item = Item.objects.create(name='Camera', category='Electronics', description='DSLR', owner=self.owner,
+                                        borrowing_terms='Rs.50 per week', rental_fee=50, deposit_amount=500)
+        overrides = self.settings(**self.SETTINGS)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # The base URL points at a closed port, so any remote call would fail the test.
+        reset_gateway()
+        self.addCleanup(reset_gateway)
+
+    def callback(self, order_id, payment_id):
+        return self.client.post(reverse('payment_success'), {
+            'razorpay_order_id': order_id,
+            'razorpay_payment_id': payment_id,
+            'razorpay_signature': sign('key_secret', f'{order_id}|{payment_id}'),
+        })
+
+    def webhook(self, payload, event_id=None):
+        body = json.dumps(payload)
+        headers = {'HTTP_X_RAZORPAY_SIGNATURE': sign('hook_secret', body)}
+        if event_id:
+            headers['HTTP_X_RAZORPAY_EVENT_ID'] = event_id
+        return self.client.post(reverse('razorpay_webhook'), body, content_type='application/json', **headers)
+
+    def captured(self, order_id, payment_id):
+        return {'event': 'payment.captured',
+                'payload': {'payment': {'entity': {'id': payment_id, 'order_id': order_id}}}}
+
+    def test_rental_callback_resolves_locally_and_is_idempotent(self):
+        PaymentIntent.objects.create(order_id='order_r1', purpose='RENTAL', item=self.item, payer=self.borrower, amount=50)
+        for _ in range(2):
+            response = self.callback('order_r1', 'pay_r1')
+            self.assertEqual(response.status_code, 200, response.content)
+        record = BorrowRecord.objects.get()
+        self.assertEqual((record.borrower, record.status, record.razorpay_payment_id), (self.borrower, 'PENDING', 'pay_r1'))
+        intent = PaymentIntent.objects.get()
+        self.assertEqual((intent.status, intent.borrow_record), ('PAID', record))
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 1)
+
+    def test_bad_signature_is_rejected(self):
+        PaymentIntent.objects.create(order_id='order_r1', purpose='RENTAL', item=self.item, payer=self.borrower, amount=50)
+        response = self.client.post(reverse('payment_success'), {
+            'razorpay_order_id': 'order_r1', 'razorpay_payment_id': 'pay_r1', 'razorpay_signature': 'forged',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(BorrowRecord.objects.exists())
+
+    def test_deposit_webhook_marks_deposit_paid_once(self):
+        record = BorrowRecord.objects.create(item=self.item, borrower=self.borrower, status='AWAITING_DEPOSIT')
+        PaymentIntent.objects.create(order_id='order_d1', purpose='DEPOSIT', item=self.item, payer=self.borrower,
+                                     borrow_record=record, amount=500)
+        payload = self.captured('order_d1', 'pay_d1')
+        self.assertEqual(self.webhook(payload, event_id='evt_1').json()['status'], 'success')
+        self.assertEqual(self.webhook(payload, event_id='evt_1').json()['status'], 'duplicate')
+        # The browser callback for the same payment arrives after the webhook.
+        self.assertEqual(self.callback('order_d1', 'pay_d1').status_code, 200)
+
+        record.refresh_from_db()
+        self.assertTrue(record.deposit_paid)
+        self.assertEqual((record.status, record.razorpay_payment_id), ('ON_LOAN', 'pay_d1'))
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 1)
+
+    def test_deposit_for_deleted_loan_is_still_recorded(self):
+        record = BorrowRecord.objects.create(item=self.item, borrower=self.borrower, status='AWAITING_DEPOSIT')
+        PaymentIntent.objects.create(order_id='order_d2', purpose='DEPOSIT', item=self.item, payer=self.borrower,
+                                     borrow_record=record, amount=500)
+        record.delete()
+        with self.assertLogs('portal.payments', level='WARNING'):
+            response = self.webhook(self.captured('order_d2', 'pay_d2'), event_id='evt_2')
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(PaymentIntent.objects.get().status, 'PAID')
+        self.assertIn('no longer exists', Notification.objects.get(recipient=self.owner).message)
+
+    def test_webhook_without_event_id_dedupes_on_payment(self):
+        PaymentIntent.objects.create(order_id='order_r2', purpose='RENTAL', item=self.item, payer=self.borrower, amount=50)
+        payload = self.captured('order_r2', 'pay_r2')
+        self.assertEqual(self.webhook(payload).json()['status'], 'success')
+        self.assertEqual(self.webhook(payload).json()['status'], 'duplicate')
+        self.assertEqual(BorrowRecord.objects.count(), 1)
+
+    def test_webhook_signature_is_checked(self):
+        response = self.client.post(reverse('razorpay_webhook'), '{}', content_type='application/json',
+                                    HTTP_X_RAZORPAY_SIGNATURE='forged')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failed_payment_marks_intent(self):
+        PaymentIntent.objects.create(order_id='order_f1', purpose='RENTAL', item=self.item, payer=self.borrower, amount=50)
+        payload = {'event': 'payment.failed', 'payload': {'payment': {'entity': {'id': 'pay_f1', 'order_id': 'order_f1'}}}}
+        self.webhook(payload)
+        self.assertEqual(PaymentIntent.objects.get().status, 'FAILED')
+
+
+class FlakyBackend(LocmemBackend):
+    """Locmem backend that rejects mail to ``bounce@`` addresses and counts opens."""
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any(address.startswith('bounce@') for address in message.to):
+                raise ConnectionError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class MailQueueTest(TestCase):
+    def setUp(self):
+        FlakyBackend.opened = 0
+        overrides = self.settings(EMAIL_BACKEND='portal.tests.FlakyBackend', MAIL_QUEUE_MAX_ATTEMPTS=2,
+                                  MAIL_QUEUE_RETRY_BACKOFF=60)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_signup_enqueues_instead_of_sending(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'newbie', 'email': 'newbie@example.com',
+            'password1': 'testpassword123', 'password2': 'testpassword123',
+        })
+        self.assertRedirects(response, reverse('login'))
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.status, queued.recipients), ('QUEUED', ['newbie@example.com']))
+
+        call_command('send_queued_mail', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/verify_email/', mail.outbox[0].body)
+        self.assertEqual(OutboundEmail.objects.get().status, 'SENT')
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(5):
+            enqueue_email('Hello', 'Body', [f'user{i}@example.com'])
+        stats = deliver_batch(batch_size=10)
+        self.assertEqual((stats['claimed'], stats['sent']), (5, 5))
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual(deliver_batch()['claimed'], 0)
+
+    def test_failures_back_off_then_dead_letter(self):
+        enqueue_email('Hello', 'Body', ['bounce@example.com'])
+        enqueue_email('Hello', 'Body', ['ok@example.com'])
+        stats = deliver_batch()
+        self.assertEqual((stats['sent'], stats['retried'], stats['dead']), (1, 1, 0))
+        failed = OutboundEmail.objects.get(status='QUEUED')
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertIn('mailbox unavailable', failed.last_error)
+
+        # Not due yet, so the next run leaves it alone.
+        self.assertEqual(deliver_batch()['claimed'], 0)
+        OutboundEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch()['dead'], 1)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('DEAD', 2))
+
+
+class ReturnQRCodeTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        item = Item.objects.create(name='Drill', category='Tools', description='Cordless', owner=self.owner,
+                                   borrowing_terms='Free')
+        self.record = BorrowRecord.objects.create(item=item, borrower=self.borrower, status='PENDING')
+        self.client.force_login(self.owner)
+        self.qr_url = 'http://testserver' + reverse('confirm_return_by_qr', args=[self.record.return_token])
+
+    def test_approval_pregenerates_images(self):
+        self.client.get(reverse('approve_request', args=[self.record.pk]))
+        for fmt in ('png', 'svg'):
+            self.assertTrue(default_storage.exists(qr_name(self.record.return_token, self.qr_url, fmt)))
+
+    def test_served_with_strong_etag_and_revalidated(self):
+        url = reverse('generate_qr_code', args=[self.record.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        cache.clear()
+        stored = default_storage.open(qr_name(self.record.return_token, self.qr_url, 'png')).read()
+        self.assertEqual(self.client.get(url).content, stored)
+
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_svg_variant(self):
+        response = self.client.get(reverse('generate_qr_code', args=[self.record.pk]), {'format': 'svg'})
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+        png = self.client.get(reverse('generate_qr_code', args=[self.record.pk]))
+        self.assertNotEqual(response['ETag'], png['ETag'])
+
+
+def make_upload(name='photo.jpg', size=(1600, 1200)):
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=False)
+class ItemImageTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+
+    def create_item(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Item.objects.create(name='Bike', category='Sports Equipment', description='Road bike',
+                                       owner=self.owner, borrowing_terms='Free', **kwargs)
+
+    def test_upload_produces_variants_without_metadata(self):
+        item = self.create_item(image=make_upload())
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height), (1600, 1200))
+        self.assertTrue(item.has_image_variants)
+        self.assertEqual(sorted(item.image_variants['webp'], key=int), ['320', '640', '1280'])
+        with default_storage.open(item.image_variants['jpeg']['320']) as stored, Image.open(stored) as thumb:
+            self.assertEqual(thumb.size, (320, 240))
+            self.assertEqual(dict(thumb.getexif()), {})
+        self.assertEqual(item.thumbnail_url, default_storage.url(item.image_variants['jpeg']['320']))
+
+    def test_small_images_are_not_upscaled(self):
+        item = self.create_item(image=make_upload(size=(500, 300)))
+        item.refresh_from_db()
+        self.assertEqual(sorted(item.image_variants['jpeg'], key=int), ['320', '500'])
+
+    def test_cards_use_srcset(self):
+        item = self.create_item(image=make_upload())
+        response = self.client.get(reverse('browse_items'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, Item.objects.get(pk=item.pk).webp_srcset)
+
+    def test_backfill_command_processes_pending_items(self):
+        item = self.create_item(image=make_upload())
+        Item.objects.filter(pk=item.pk).update(image_variants={})
+        out = io.StringIO()
+        call_command('process_item_images', workers=2, stdout=out)
+        self.assertIn('Processed 1 images (0 failed)', out.getvalue())
+        self.assertTrue(Item.objects.get(pk=item.pk).has_image_variants)
+
+
+class RatingAggregateTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.item = Item.objects.create(name='Tent', category='Other', description='Two person', owner=self.owner,
+                                        borrowing_terms='Free')
+
+    def review(self, rating, username):
+        borrower = User.objects.create_user(username=username, password='pass12345')
+        record = BorrowRecord.objects.create(item=self.item, borrower=borrower, status='RETURNED')
+        self.client.force_login(borrower)
+        response = self.client.post(reverse('leave_feedback', args=[record.pk]), {'rating': rating, 'comment': ''})
+        self.assertEqual(response.status_code, 302)
+        return record
+
+    def test_feedback_updates_aggregates(self):
+        self.review(5, 'a')
+        self.review(4, 'b')
+        self.review(4, 'c')
+        self.owner.refresh_from_db()
+        self.assertEqual((self.owner.rating_count, self.owner.rating_sum), (3, 13))
+        self.assertEqual((self.owner.rating_4_count, self.owner.rating_5_count, self.owner.rating_1_count), (2, 1, 0))
+        self.assertEqual(self.owner.average_rating, 4.33)
+        self.assertEqual(self.owner.rating_histogram[:2], [(5, 1, 33), (4, 2, 67)])
+
+        Feedback.objects.get(rating=5).delete()
+        self.owner.refresh_from_db()
+        self.assertEqual((self.owner.rating_count, self.owner.average_rating), (2, 4.0))
+
+    def test_stale_save_does_not_clobber_counters(self):
+        stale = User.objects.get(pk=self.owner.pk)
+        self.review(3, 'a')
+        stale.location = 'Pune'
+        stale.save()
+        self.owner.refresh_from_db()
+        self.assertEqual((self.owner.rating_count, self.owner.average_rating), (1, 3.0))
+
+    def test_reconcile_repairs_drift(self):
+        self.review(2, 'a')
+        User.objects.filter(pk=self.owner.pk).update(rating_count=9, rating_2_count=0, average_rating=1.0)
+        out = io.StringIO()
+        call_command('reconcile_ratings', stdout=out)
+        self.assertIn('of 1 users', out.getvalue())
+        self.owner.refresh_from_db()
+        self.assertEqual((self.owner.rating_count, self.owner.rating_2_count, self.owner.average_rating), (1, 1, 2.0))
+
+    def test_public_profile_shows_distribution(self):
+        self.review(5, 'a')
+        with CaptureQueriesContext(connections['default']) as context:
+            response = self.client.get(reverse('public_profile', args=['owner']))
+        # The distribution comes from the user row, not an aggregate over reviews.
+        aggregates = [q['sql'] for q in context.captured_queries if 'COUNT(' in q['sql'] or 'AVG(' in q['sql']]
+        self.assertFalse([sql for sql in aggregates if '"portal_feedback"' in sql])
+        self.assertContains(response, 'rating-histogram')
+        self.assertContains(response, '(1 review)')
+
+
+class PublicProfileTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.items = [
+            Item.objects.create(name=f'Item {i}', category='Books', description='Book', owner=self.owner,
+                                borrowing_terms='Free')
+            for i in range(views.PROFILE_ITEMS_PAGE_SIZE + 2)
+        ]
+        for i in range(views.PROFILE_REVIEWS_PAGE_SIZE + 2):
+            reviewer = User.objects.create_user(username=f'reviewer{i}', password='pass12345')
+            record = BorrowRecord.objects.create(item=self.items[0], borrower=reviewer, status='RETURNED')
+            Feedback.objects.create(borrow_record=record, reviewer=reviewer, reviewee=self.owner, rating=4,
+                                    comment=f'Review {i}')
+        self.url = reverse('public_profile', args=['owner'])
+
+    def test_pages_are_bounded(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context['lended_items']), views.PROFILE_ITEMS_PAGE_SIZE)
+        self.assertEqual(len(response.context['reviews']), views.PROFILE_REVIEWS_PAGE_SIZE)
+        self.assertTrue(response.context['reviews'].has_next())
+
+        older = self.client.get(self.url, {'reviews_cursor': response.context['reviews'].next_cursor})
+        self.assertEqual([r.comment for r in older.context['reviews']], ['Review 1', 'Review 0'])
+        # Paging reviews leaves the items list where it was.
+        self.assertEqual(len(older.context['lended_items']), views.PROFILE_ITEMS_PAGE_SIZE)
+
+    def test_warm_profile_is_three_queries(self):
+        self.client.get(self.url)
+        # User row, one page of items and one page of reviews with their
+        # reviewers joined in; the summary comes from the cache.
+        with self.assertQueryBudget(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'reviewer11')
+        self.assertEqual(response.context['summary'], {
+            'items_listed': 10, 'items_available': 10, 'loans_lent': 12, 'loans_borrowed': 0,
+        })
+
+    def test_summary_is_invalidated_by_changes(self):
+        self.client.get(self.url)
+        Item.objects.create(name='New', category='Books', description='Book', owner=self.owner, borrowing_terms='Free')
+        self.assertEqual(self.client.get(self.url).context['summary']['items_listed'], 11)
+
+        borrower = User.objects.get(username='reviewer0')
+        record = BorrowRecord.objects.create(item=self.items[1], borrower=borrower, status='PENDING')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(transitions.approve(record))
+        self.assertEqual(self.client.get(self.url).context['summary']['items_available'], 10)
+        transitions.mark_returned(record)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(transitions.confirm_return(record))
+        self.assertEqual(self.client.get(self.url).context['summary']['loans_lent'], 13)
+        self.assertEqual(profile_summary(borrower)['loans_borrowed'], 2)
+
+
+class NotificationStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+
+    def test_wsgi_requests_are_not_streamed(self):
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 401)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 204)
+
+    def test_hub_delivers_from_other_threads(self):
+        async def scenario():
+            queue = hub.subscribe(42)
+            try:
+                self.assertEqual(hub.connection_count(), 1)
+                thread = threading.Thread(target=publish, args=(42, 'unread'), kwargs={'count': 3})
+                thread.start()
+                thread.join()
+                return await asyncio.wait_for(queue.get(), 1)
+            finally:
+                hub.unsubscribe(42, queue)
+
+        self.assertEqual(asyncio.run(scenario()), {'type': 'unread', 'count': 3})
+        self.assertEqual(hub.connection_count(), 0)
+
+    async def test_stream_pushes_new_notifications(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertEqual(await anext(frames), b'retry: 5000\n\n')
+        self.assertIn(b'"count": 0', await anext(frames))
+
+        def notify():
+            with self.captureOnCommitCallbacks(execute=True):
+                Notification.objects.create(recipient=self.user, message='Your request was approved.')
+        await sync_to_async(notify)()
+
+        frame = await asyncio.wait_for(anext(frames), 1)
+        self.assertTrue(frame.startswith(b'event: notification\n'))
+        self.assertIn(b'Your request was approved.', frame)
+
+        # Disconnect the way the ASGI server does: cancel the pending read.
+        # Closing the test client's wrappers alone wouldn't reach the stream.
+        pending = asyncio.ensure_future(anext(frames))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        await frames.aclose()
+        self.assertEqual(hub.connection_count(), 0)
+
+    def test_closing_stream_unsubscribes(self):
+        async def scenario():
+            stream = event_stream(7, 0)
+            await anext(stream)
+            connected = hub.connection_count()
+            await stream.aclose()
+            return connected, hub.connection_count()
+
+        self.assertEqual(asyncio.run(scenario()), (1, 0))
+
+
+class NotificationInboxTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.notifications = [Notification.objects.create(recipient=self.user, message=f'Message {i}') for i in range(45)]
+        self.client.force_login(self.user)
+
+    def test_inbox_is_paginated_and_does_not_mark_read(self):
+        url = reverse('notifications')
+        with self.assertQueryBudget(3):
+            first = self.client.get(url)
+        page = first.context['notifications']
+        self.assertEqual([n.message for n in page][:2], ['Message 44', 'Message 43'])
+        self.assertEqual(len(page), 20)
+        with self.assertQueryBudget(3):
+            second = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(second.context['notifications'].object_list[0].message, 'Message 24')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 45)
+
+    def test_mark_single_read(self):
+        target = self.notifications[0]
+        response = self.client.post(reverse('mark_notification_read', args=[target.pk]), {'next': '/notifications/?cursor=x'})
+        self.assertRedirects(response, '/notifications/?cursor=x', fetch_redirect_response=False)
+        # Replays and other users' notifications change nothing.
+        self.client.post(reverse('mark_notification_read', args=[target.pk]))
+        foreign = Notification.objects.create(recipient=self.other, message='Not yours')
+        self.client.post(reverse('mark_notification_read', args=[foreign.pk]))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 44)
+        self.assertFalse(Notification.objects.get(pk=foreign.pk).is_read)
+        self.assertEqual(self.client.get(reverse('mark_notification_read', args=[target.pk])).status_code, 405)
+
+    def test_offsite_next_is_ignored(self):
+        response = self.client.post(reverse('mark_all_notifications_read'), {'next': 'https://evil.example/'})
+        self.assertRedirects(response, reverse('notifications'), fetch_redirect_response=False)
+
+    def test_archive_moves_old_read_notifications(self):
+        Notification.objects.filter(recipient=self.user).update(timestamp=timezone.now() - timedelta(days=120))
+        Notification.objects.filter(pk__in=[n.pk for n in self.notifications[:30]]).update(is_read=True)
+        recent = Notification.objects.create(recipient=self.user, message='Recent', is_read=True)
+        out = io.StringIO()
+        call_command('archive_notifications', days=90, batch_size=7, stdout=out)
+        self.assertIn('Archived 30 notifications', out.getvalue())
+        self.assertEqual(ArchivedNotification.objects.count(), 30)
+        self.assertEqual(Notification.objects.filter(is_read=True).get(), recent)
+        # Only read rows move, so the unread counter is left alone.
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notifications_count, 45)
+
+
+class LoanReminderTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        self.item = Item.objects.create(name='Ladder', category='Tools', description='Aluminium', owner=self.owner,
+                                        borrowing_terms='Free')
+        now = timezone.now()
+        self.overdue = self.loan(now - timedelta(days=2))
+        self.due_soon = self.loan(now + timedelta(hours=5))
+        self.later = self.loan(now + timedelta(days=5))
+        self.returned = self.loan(now - timedelta(days=3), status='RETURNED')
+
+    def loan(self, return_date, status='ON_LOAN'):
+        return BorrowRecord.objects.create(item=self.item, borrower=self.borrower, status=status, return_date=return_date)
+
+    def run_sweep(self):
+        out = io.StringIO()
+        call_command('send_loan_reminders', batch_size=1, stdout=out)
+        return out.getvalue()
+
+    def test_sweep_notifies_both_parties_once(self):
+        output = self.run_sweep()
+        self.assertIn('Scanned 2 loans: 1 overdue and 1 due-soon reminders, 4 notifications', output)
+        self.assertEqual(
+            set(LoanReminder.objects.values_list('borrow_record', 'kind')),
+            {(self.overdue.pk, 'OVERDUE'), (self.due_soon.pk, 'DUE_SOON')},
+        )
+        self.assertTrue(Notification.objects.filter(recipient=self.borrower, message__contains='overdue').exists())
+        self.assertEqual(Notification.objects.filter(recipient=self.owner).count(), 2)
+        self.borrower.refresh_from_db()
+        self.assertEqual(self.borrower.unread_notifications_count, 2)
+
+        # A re-run finds nothing to do.
+        with self.assertNumQueries(2):
+            self.assertIn('Scanned 0 loans', self.run_sweep())
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_due_soon_loan_later_gets_overdue_reminder(self):
+        self.run_sweep()
+        BorrowRecord.objects.filter(pk=self.due_soon.pk).update(return_date=timezone.now() - timedelta(hours=1))
+        self.assertIn('1 overdue and 0 due-soon', self.run_sweep())
+        self.assertEqual(LoanReminder.objects.filter(borrow_record=self.due_soon).count(), 2)
+
+
+class BorrowTransitionTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.item = Item.objects.create(name='Kayak', category='Sports Equipment', description='Single seat',
+                                        owner=self.owner, borrowing_terms='Free', borrowing_period=3)
+        self.first, self.second = [
+            BorrowRecord.objects.create(item=self.item, status='PENDING',
+                                        borrower=User.objects.create_user(username=name, password='pass12345'))
+            for name in ('first', 'second')
+        ]
+
+    def test_second_approval_for_same_item_loses(self):
+        self.assertTrue(transitions.approve(self.first))
+        self.assertFalse(transitions.approve(self.second))
+        self.assertEqual(BorrowRecord.objects.get(pk=self.second.pk).status, 'PENDING')
+        self.assertFalse(Item.objects.get(pk=self.item.pk).is_available)
+
+    def test_stale_instance_cannot_replay(self):
+        stale = BorrowRecord.objects.get(pk=self.first.pk)
+        self.assertTrue(transitions.approve(self.first))
+        self.assertTrue(transitions.mark_returned(self.first))
+        self.assertFalse(transitions.approve(stale))
+        self.assertFalse(transitions.mark_returned(stale))
+        self.assertEqual(BorrowRecord.objects.get(pk=self.first.pk).status, 'RETURN_PENDING')
+
+    def test_only_changed_columns_are_written(self):
+        with CaptureQueriesContext(connections['default']) as context:
+            transitions.approve(self.first)
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "portal_borrowrecord"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('razorpay', updates[0])
+        self.assertIn('"return_date"', updates[0])
+
+    def test_view_reports_lost_race(self):
+        transitions.approve(self.first)
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('approve_request', args=[self.second.pk]), follow=True)
+        self.assertContains(response, 'already on loan to someone else')
+
+
+class BorrowTransitionStressTest(TransactionTestCase):
+    def test_concurrent_transitions_never_double_lend(self):
+        out = io.StringIO()
+        call_command('stress_transitions', threads=6, items=15, requests_per_item=4, stdout=out)
+        self.assertIn('approve: 60 attempts, 15 won', out.getvalue())
+        self.assertIn('confirm_return: 30 attempts, 15 won', out.getvalue())
+        self.assertFalse(User.objects.exists())
+
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.item = Item.objects.create(name='Tent', category='Sports Equipment', description='Two person',
+                                        owner=self.owner, borrowing_terms='Free', borrowing_period=5)
+        self.spare = Item.objects.create(name='Stove', category='Sports Equipment', description='Camping',
+                                         owner=self.owner, borrowing_terms='Free')
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def days(self, first, last):
+        return self.day + timedelta(days=first), self.day + timedelta(days=last)
+
+    def test_overlap_boundaries(self):
+        reservations.reserve(self.item, self.borrower, *self.days(0, 3))
+        for first, last in ((3, 5), (-2, 0), (1, 2), (-1, 4)):
+            with self.subTest(first=first, last=last):
+                with self.assertRaises(reservations.ReservationConflict):
+                    reservations.reserve(self.item, self.other, *self.days(first, last))
+        # Ranges that only touch the booking's edges are free.
+        reservations.reserve(self.item, self.other, *self.days(4, 6))
+        reservations.reserve(self.item, self.other, *self.days(-3, -1))
+        self.assertEqual(Reservation.objects.filter(item=self.item).count(), 3)
+
+    def test_cancelled_reservation_frees_dates(self):
+        reservation = reservations.reserve(self.item, self.borrower, *self.days(0, 3))
+        self.assertTrue(reservations.cancel(reservation))
+        self.assertFalse(reservations.cancel(reservation))
+        reservations.reserve(self.item, self.other, *self.days(1, 2))
+
+    def test_active_loan_blocks_dates_until_return(self):
+        BorrowRecord.objects.create(item=self.item, borrower=self.other, status='ON_LOAN',
+                                    return_date=timezone.now() + timedelta(days=12))
+        with self.assertRaises(reservations.ReservationConflict):
+            reservations.reserve(self.item, self.borrower, *self.days(0, 1))
+        reservations.reserve(self.item, self.borrower, *self.days(3, 4))
+
+    def test_overdue_loan_still_blocks(self):
+        BorrowRecord.objects.create(item=self.item, borrower=self.other, status='ON_LOAN',
+                                    return_date=timezone.now() - timedelta(days=2))
+        today = timezone.localdate()
+        with self.assertRaises(reservations.ReservationConflict):
+            reservations.reserve(self.item, self.borrower, today, today + timedelta(days=1))
+        self.assertEqual(list(reservations.free_between(Item.objects.all(), *self.days(0, 1))), [self.spare])
+
+    def test_approve_respects_reservations(self):
+        today = timezone.localdate()
+        record = BorrowRecord.objects.create(item=self.item, borrower=self.borrower, status='PENDING')
+        # The borrower's own booking and one after the five-day loan don't block it.
+        reservations.reserve(self.item, self.borrower, today + timedelta(days=1), today + timedelta(days=2))
+        reservations.reserve(self.item, self.other, today + timedelta(days=6), today + timedelta(days=7))
+        clash = reservations.reserve(self.item, self.other, today + timedelta(days=3), today + timedelta(days=4))
+        with self.assertRaises(reservations.ReservationConflict):
+            transitions.approve(record)
+        record.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual((record.status, self.item.is_available), ('PENDING', True))
+
+        reservations.cancel(clash)
+        self.assertTrue(transitions.approve(record))
+
+    def test_free_between(self):
+        reservations.reserve(self.item, self.borrower, *self.days(0, 3))
+        free = reservations.free_between(Item.objects.all(), *self.days(2, 5))
+        self.assertEqual(list(free), [self.spare])
+        self.assertEqual(set(reservations.free_between(Item.objects.all(), *self.days(4, 5))), {self.item, self.spare})
+
+    def test_browse_filters_by_dates(self):
+        reservations.reserve(self.item, self.borrower, *self.days(0, 3))
+        first, last = self.days(1, 2)
+        response = self.client.get(reverse('browse_items'), {'available_from': first, 'available_to': last})
+        self.assertNotContains(response, 'Tent')
+        self.assertContains(response, 'Stove')
+        # Swapped or malformed dates are ignored rather than rejected.
+        response = self.client.get(reverse('browse_items'), {'available_from': last, 'available_to': first})
+        self.assertContains(response, 'Tent')
+
+    def test_reserve_view_respects_borrowing_period(self):
+        self.client.force_login(self.borrower)
+        start, end = self.days(0, 5)
+        response = self.client.post(reverse('reserve_item', args=[self.item.pk]),
+                                    {'start_date': start, 'end_date': end}, follow=True)
+        self.assertContains(response, 'at most 5 days')
+        self.assertFalse(Reservation.objects.exists())
+
+        start, end = self.days(0, 4)
+        response = self.client.post(reverse('reserve_item', args=[self.item.pk]),
+                                    {'start_date': start, 'end_date': end}, follow=True)
+        self.assertContains(response, 'is reserved for you')
+        self.assertTrue(Notification.objects.filter(recipient=self.owner, message__contains='reserved').exists())
+
+    def test_overlap_query_on_large_calendar(self):
+        owners = User.objects.bulk_create(User(username=f'lender{i}') for i in range(10))
+        items = Item.objects.bulk_create(
+            Item(name=f'Item {i}', category='Tools', description='Tool', owner=owners[i % 10], borrowing_terms='Free')
+            for i in range(300)
+        )
+        # Forty back-to-back three-day bookings per item, with a gap every fifth.
+        Reservation.objects.bulk_create(
+            Reservation(item=item, borrower=self.borrower, start_date=start, end_date=start + timedelta(days=2))
+            for item in items
+            for n in range(40)
+            for start in [self.day + timedelta(days=4 * n + (item.pk % 4))]
+        )
+        probe = reservations.overlapping_reservations(*self.days(50, 52)).filter(item=items[0])
+        self.assertIn('reservation_item_span_idx', probe.explain())
+
+        started = time.perf_counter()
+        free = list(reservations.free_between(Item.objects.all(), *self.days(80, 80)).values_list('pk', flat=True))
+        elapsed = time.perf_counter() - started
+        self.assertTrue(free)
+        self.assertLess(elapsed, 1.0)
+
+
+class ApiTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345', location='Pune')
+        self.borrower = User.objects.create_user(username='borrower', password='pass12345')
+        self.items = [
+            Item.objects.create(name=f'Item {i}', category='Books' if i % 2 else 'Tools', description='Thing',
+                                owner=self.owner, borrowing_terms='Free')
+            for i in range(5)
+        ]
+        for item in self.items:
+            BorrowRecord.objects.create(item=item, borrower=self.borrower, status='RETURNED')
+            Notification.objects.create(recipient=self.borrower, message=f'Update on {item.name}')
+
+    def test_items_cursor_pagination(self):
+        names, url = [], reverse('v1:item-list') + '?page_size=2'
+        while url:
+            with self.assertQueryBudget(1):
+                data = self.client.get(url).json()
+            names += [item['name'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(names, [f'Item {i}' for i in range(4, -1, -1)])
+
+        data = self.client.get(reverse('v1:item-list'), {'category': 'Books'}).json()
+        self.assertEqual([item['name'] for item in data['results']], ['Item 3', 'Item 1'])
+        self.assertEqual(data['results'][0]['owner'], {'username': 'owner', 'location': 'Pune', 'average_rating': 0.0})
+
+    def test_sparse_fields(self):
+        data = self.client.get(reverse('v1:item-list'), {'fields': 'id,name,bogus'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'name'})
+        data = self.client.get(reverse('v1:item-detail', args=[self.items[0].pk]), {'fields': 'bogus'}).json()
+        self.assertIn('description', data)
+
+    def test_etag_revalidation(self):
+        url = reverse('v1:item-detail', args=[self.items[0].pk])
+        with self.assertQueryBudget(1):
+            response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+        Item.objects.filter(pk=self.items[0].pk).update(name='Renamed')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_public_profile(self):
+        Feedback.objects.create(borrow_record=BorrowRecord.objects.first(), reviewer=self.borrower,
+                                reviewee=self.owner, rating=5)
+        with self.assertQueryBudget(1):
+            data = self.client.get(reverse('v1:profile-detail', args=['owner'])).json()
+        self.assertEqual(data['rating_count'], 1)
+        self.assertEqual(data['rating_histogram']['5'], 1)
+        self.assertEqual(self.client.get(reverse('v1:profile-detail', args=['nobody'])).status_code, 404)
+
+    def test_user_endpoints_need_login(self):
+        for name in ('v1:borrow-record-list', 'v1:notification-list'):
+            self.assertEqual(self.client.get(reverse(name)).status_code, 403)
+
+    def test_borrow_records_and_notifications(self):
+        self.client.force_login(self.borrower)
+        # Session and user lookups, then one query per page.
+        with self.assertQueryBudget(3):
+            data = self.client.get(reverse('v1:borrow-record-list'), {'status': 'history'}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['results'][0]['lender'], 'owner')
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('v1:notification-list'), {'page_size': 3})
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertIn('private', response['Cache-Control'])
+
+        self.client.force_login(self.owner)
+        data = self.client.get(reverse('v1:borrow-record-list'), {'role': 'lender'}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(self.client.get(reverse('v1:notification-list')).json()['results'], [])
+
+
+@contextmanager
+def mock_in_atomic_block(value):
+    connection = connections['default']
+    saved = connection.in_atomic_block
+    connection.in_atomic_block = value
+    try:
+        yield
+    finally:
+        connection.in_atomic_block = saved
+
+
+class DatabaseConfigTest(TestCase):
+    def test_sqlite_pragmas(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def test_router_reads_from_replica_only_when_marked(self):
+        router = ReadReplicaRouter()
+        # The alias must exist; reuse default's settings for the test.
+        router.replica_alias = 'default'
+        self.assertIsNone(router.db_for_read(Item))
+        with reading_from_replica():
+            # TestCase wraps each test in a transaction on the primary.
+            self.assertIsNone(router.db_for_read(Item))
+        with reading_from_replica(), mock_in_atomic_block(False):
+            self.assertEqual(router.db_for_read(Item), 'default')
+            self.assertIsNone(router.db_for_read(Session))
+        self.assertEqual(router.db_for_write(Item), 'default')
+
+    def test_request_user_is_loaded_from_primary(self):
+        router = ReadReplicaRouter()
+        router.replica_alias = 'default'
+        routed = []
+
+        def load_user():
+            routed.append(router.db_for_read(User))
+            return AnonymousUser()
+
+        @use_read_replica
+        def view(request):
+            return HttpResponse(request.user.is_authenticated)
+
+        request = RequestFactory().get('/')
+        request.user = SimpleLazyObject(load_user)
+        with mock_in_atomic_block(False):
+            view(request)
+        self.assertEqual(routed, [None])
+
+    def test_router_without_replica(self):
+        with reading_from_replica(), mock_in_atomic_block(False):
+            self.assertIsNone(ReadReplicaRouter().db_for_read(Item))
+        self.assertFalse(ReadReplicaRouter().allow_migrate('replica', 'portal'))
+        self.assertTrue(ReadReplicaRouter().allow_migrate('default', 'portal'))
+
+
+class WorkflowBenchmarkTest(TransactionTestCase):
+    def test_runs_complete_loans_and_cleans_up(self):
+        # One thread: the shared in-memory test database locks whole tables.
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/baseline.json'
+            call_command('benchmark_workflow', workflows=4, threads=1, lenders=2, catalogue=5,
+                         save_baseline=path, stdout=out)
+            with open(path) as f:
+                result = json.load(f)
+        self.assertEqual(result['failed_workflows'], 0)
+        self.assertEqual(result['views']['confirm_return']['requests'], 4)
+        self.assertEqual(result['views']['leave_feedback:post']['errors'], 0)
+        self.assertGreater(result['views']['approve_request']['queries_per_request'], 0)
+        self.assertIn('0 of 4 workflows failed', out.getvalue())
+        self.assertFalse(User.objects.exists())
+
+    def test_compare_to_baseline(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 50), 3)
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 99), 5)
+        baseline = {'requests_per_second': 100, 'views': {
+            'home': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'queries_per_request': 1},
+        }}
+        same = {'requests_per_second': 95, 'views': {
+            'home': {'p50_ms': 11, 'p95_ms': 20, 'p99_ms': 35, 'queries_per_request': 1},
+            'new_view': {'p50_ms': 99, 'p95_ms': 99, 'p99_ms': 99, 'queries_per_request': 9},
+        }}
+        self.assertEqual(compare_to_baseline(same, baseline, 0.2), [])
+        worse = {'requests_per_second': 50, 'views': {
+            'home': {'p50_ms': 10, 'p95_ms': 40, 'p99_ms': 30, 'queries_per_request': 2},
+        }}
+        self.assertEqual(compare_to_baseline(worse, baseline, 0.2), [
+            'home p95_ms 20 -> 40', 'home queries/request 1 -> 2', 'requests/s 100 -> 50',
+        ])
+
+
+class SyntheticDataTest(TestCase):
+    def generate(self, **options):
+        options = {'users': 30, 'items': 60, 'loans': 200, 'batch_size': 50, 'until': '2026-01-31', 'stdout': io.StringIO(),
+                   **options}
+        call_command('generate_synthetic_data', **options)
+        return options['stdout'].getvalue()
+
+    def call(self, name):
+        out = io.StringIO()
+        call_command(name, stdout=out)
+        return out.getvalue()
+
+    def snapshot(self):
+        return (
+            list(Item.objects.order_by('pk').values_list('name', 'category', 'owner__username', 'date_posted')),
+            list(BorrowRecord.objects.order_by('pk').values_list('status', 'borrower__username', 'borrow_date')),
+            list(Feedback.objects.order_by('pk').values_list('rating', 'reviewee__username')),
+        )
+
+    def test_generates_consistent_rows(self):
+        output = self.generate()
+        self.assertIn('borrow records: 200 rows', output)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Notification.objects.count(), 400)
+        self.assertTrue(Feedback.objects.exists())
+        # Counters were written alongside the rows, so there is nothing to repair.
+        self.assertIn('Repaired 0 unread', self.call('reconcile_unread_counts'))
+        self.assertIn('aggregates of 0 users', self.call('reconcile_ratings'))
+
+        active = BorrowRecord.objects.filter(status__in=['ON_LOAN', 'AWAITING_DEPOSIT', 'RETURN_PENDING'])
+        self.assertEqual(active.count(), active.values('item').distinct().count())
+        self.assertEqual(set(active.values_list('item', flat=True)),
+                         set(Item.objects.filter(is_available=False).values_list('pk', flat=True)))
+        self.assertFalse(BorrowRecord.objects.filter(item__owner=F('borrower')).exists())
+        self.assertFalse(BorrowRecord.objects.filter(borrow_date__lt=F('item__date_posted')).exists())
+
+    def test_same_seed_same_rows(self):
+        self.generate()
+        first = self.snapshot()
+        User.objects.all().delete()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_distributions(self):
+        self.generate(status_mix='RETURNED=1,PENDING=1', category_mix='Tools=1', lender_share=0.1)
+        self.assertEqual(set(BorrowRecord.objects.values_list('status', flat=True)), {'RETURNED', 'PENDING'})
+        self.assertEqual(set(Item.objects.values_list('category', flat=True)), {'Tools'})
+        self.assertEqual(Item.objects.values('owner').distinct().count(), 3)
+        with self.assertRaises(CommandError):
+            self.generate(status_mix='LOST=5')
+
+
+class StaticAssetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, static_root, ignore_errors=True)
+        overrides = override_settings(STATIC_ROOT=static_root, STORAGES={
+            **settings.STORAGES, 'staticfiles': {'BACKEND': 'portal.assets.CompressedManifestStaticFilesStorage'},
+        })
+        overrides.enable()
+        cls.addClassCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.stylesheet = staticfiles_storage.stored_name('css/style.css')
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        self.assertRegex(self.stylesheet, r'^css/style\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(self.stylesheet + '.gz'))
+        with staticfiles_storage.open(self.stylesheet) as minified, open(settings.STATICFILES_DIRS[0] / 'css/style.css', 'rb') as source:
+            self.assertLess(len(minified.read()), len(source.read()))
+
+    def test_templates_use_hashed_names(self):
+        self.assertContains(self.client.get(reverse('home')), f'/static/{self.stylesheet}')
+
+    def test_serves_negotiated_encoding_with_immutable_caching(self):
+        url = f'/static/{self.stylesheet}'
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn(b':root{', gzip.decompress(b''.join(response.streaming_content)))
+
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    @skipUnless(brotli, "brotli is not installed")
+    def test_brotli_preferred_when_accepted(self):
+        self.assertTrue(staticfiles_storage.exists(self.stylesheet + '.br'))
+        response = self.client.get(f'/static/{self.stylesheet}', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(b':root{', brotli.decompress(b''.join(response.streaming_content)))
+
+    def test_plain_names_only_without_manifest_in_debug(self):
+        storage = CompressedManifestStaticFilesStorage(location=tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, storage.location, ignore_errors=True)
+        with self.settings(DEBUG=True):
+            self.assertEqual(storage.stored_name('css/style.css'), 'css/style.css')
+        with self.assertRaises(ValueError):
+            storage.stored_name('css/style.css')
+
+    def test_unhashed_names_revalidate(self):
+        response = self.client.get('/static/css/style.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        revalidated = self.client.get('/static/css/style.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_missing_and_escaping_paths_fall_through(self):
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+    def test_minify_css_keeps_strings_and_selectors(self):
+        css = '/* x */ a :hover ,b > c {\n  content: "a  ;  b" ;\n  margin : 0 auto;\n}'
+        self.assertEqual(minify_css(css), 'a :hover,b>c{content:"a  ;  b";margin :0 auto}')
+
+
+class ConditionalGetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.item = Item.objects.create(name='Tent', category='Other', description='Two person', owner=self.owner,
+                                        borrowing_terms='Free')
+        self.url = reverse('item_detail', args=[self.item.pk])
+
+    def test_item_revalidation_is_one_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        # Only the (updated_at, owner rating) lookup runs; nothing is rendered.
+        with self.assertQueryBudget(1), self.assertTemplateNotUsed('item_detail.html'):
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_if_modified_since_alone_never_revalidates(self):
+        self.assertFalse(self.client.get(self.url).has_header('Last-Modified'))
+        # The item row is unchanged, but the page now lists a reservation.
+        borrower = User.objects.create_user(username='borrower', password='pass12345')
+        Reservation.objects.create(item=self.item, borrower=borrower, start_date=timezone.localdate(),
+                                   end_date=timezone.localdate())
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Booked')
+
+    def test_item_changes_invalidate(self):
+        etag = self.client.get(self.url)['ETag']
+        transitions.set_item_availability(self.item.pk, False)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(self.url)['ETag']
+        borrower = User.objects.create_user(username='borrower', password='pass12345')
+        Reservation.objects.create(item=self.item, borrower=borrower, start_date=timezone.localdate(),
+                                   end_date=timezone.localdate())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_differ_per_viewer(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_catalogue_pages_revalidate_without_queries(self):
+        for name in ('home', 'browse_items'):
+            with self.subTest(name=name):
+                etag = self.client.get(reverse(name), {'category': 'Other'})['ETag']
+                with self.assertQueryBudget(0):
+                    response = self.client.get(reverse(name), {'category': 'Other'}, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        etag = self.client.get(reverse('browse_items'))['ETag']
+        self.assertEqual(self.client.get(reverse('browse_items'), {'category': 'Books'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        Item.objects.create(name='Lamp', category='Other', description='Desk', owner=self.owner, borrowing_terms='Free')
+        self.assertEqual(self.client.get(reverse('browse_items'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_item_is_still_404(self):
+        self.assertEqual(self.client.get(reverse('item_detail', args=[999]), HTTP_IF_NONE_MATCH='"x"').status_code, 404)
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .catalogue_cache import bump_catalogue_version
+from .models import BorrowRecord, Item
+from .profiles import invalidate_profile_summary
+from .reservations import ReservationConflict, overlapping_reservations
+
+# name -> (statuses the record may be in, status it moves to)
+TRANSITIONS = {
+    'approve': (('PENDING',), 'ON_LOAN'),
+    'reject': (('PENDING',), 'CANCELLED'),
+    'mark_returned': (('ON_LOAN',), 'RETURN_PENDING'),
+    'confirm_return': (('RETURN_PENDING',), 'RETURNED'),
+    'request_deposit': (('ON_LOAN',), 'AWAITING_DEPOSIT'),
+    'deposit_paid': (('AWAITING_DEPOSIT',), 'ON_LOAN'),
+}
+
+
+def set_item_availability(item_id, available):
+    """Flip ``Item.is_available`` only if it currently has the other value.
+
+    Returns whether this call made the change. Listings filter on
+    availability, so the catalogue cache is invalidated on success.
+    """
+    changed = Item.objects.filter(pk=item_id, is_available=not available).update(
+        is_available=available, updated_at=timezone.now(),
+    )
+    if changed:
+        transaction.on_commit(bump_catalogue_version)
+    return bool(changed)
+
+
+def transition(record, name, **fields):
+    """Apply a named transition with one conditional UPDATE.
+
+    The UPDATE only matches while the record is still in an allowed status,
+    so of two concurrent callers exactly one wins. Only ``status`` and
+    ``fields`` are written. Returns True if this call won; ``record`` is
+    then updated in memory to match.
+    """
+    sources, target = TRANSITIONS[name]
+    won = BorrowRecord.objects.filter(pk=record.pk, status__in=sources).update(status=target, **fields)
+    if won:
+        record.status = target
+        for field, value in fields.items():
+            setattr(record, field, value)
+    return bool(won)
+
+
+def approve(record):
+    """PENDING -> ON_LOAN, claiming the item so it can't be lent twice.
+
+    Raises ``ReservationConflict`` if the loan would run into someone
+    else's confirmed reservation.
+    """
+    return_date = timezone.now() + timezone.timedelta(days=record.item.borrowing_period)
+    with transaction.atomic():
+        # Lock the item as reserve() does, so no booking lands between the
+        # check and the claim.
+        Item.objects.select_for_update().filter(pk=record.item_id).first()
+        clash = (
+            overlapping_reservations(timezone.localdate(), timezone.localdate(return_date))
+            .filter(item_id=record.item_id).exclude(borrower_id=record.borrower_id)
+            .order_by('start_date').first()
+        )
+        if clash is not None:
+            raise ReservationConflict(
+                f"The loan would run into a reservation from {clash.start_date} to {clash.end_date}."
+            )
+        # Claim the item first: if another approval already took it, nothing
+        # has been written and this request stays pending.
+        if not set_item_availability(record.item_id, False):
+            return False
+        if not transition(record, 'approve', return_date=return_date):
+            transaction.set_rollback(True)
+            return False
+        # The owner's available-item count just changed.
+        transaction.on_commit(lambda: invalidate_profile_summary(record.item.owner_id))
+    record.item.is_available = False
+    return True
+
+
+def reject(record):
+    return transition(record, 'reject')
+
+
+def mark_returned(record):
+    return transition(record, 'mark_returned')
+
+
+def confirm_return(record):
+    """RETURN_PENDING -> RETURNED, making the item available again."""
+    with transaction.atomic():
+        if not transition(record, 'confirm_return', actual_return_date=timezone.now()):
+            return False
+        set_item_availability(record.item_id, True)
+        # Both sides' completed-loan counts and the owner's available items.
+        transaction.on_commit(lambda: invalidate_profile_summary(record.item.owner_id, record.borrower_id))
+    record.item.is_available = True
+    return True
+
+
+def request_deposit(record):
+    return transition(record, 'request_deposit')
+
+
+def deposit_paid(record):
+    """AWAITING_DEPOSIT -> ON_LOAN; a deposit paid while on loan changes nothing."""
+    return transition(record, 'deposit_paid')
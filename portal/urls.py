@@ -20,6 +20,8 @@ urlpatterns = [
     path('approve/<int:record_id>/', views.approve_request_view, name='approve_request'),
     path('reject/<int:record_id>/', views.reject_request_view, name='reject_request'),
     path('item/<int:item_id>/', views.item_detail_view, name='item_detail'),
+    path('item/<int:item_id>/reserve/', views.reserve_item, name='reserve_item'),
+    path('reservations/<int:reservation_id>/cancel/', views.cancel_reservation, name='cancel_reservation'),
     path('return/<int:record_id>/', views.mark_as_returned_view, name='mark_as_returned'),
     path('confirm_return/<int:record_id>/', views.confirm_return_view, name='confirm_return'),
     path('generate_qr_code/<int:record_id>/', views.generate_qr_code, name='generate_qr_code'),
@@ -27,8 +29,12 @@ urlpatterns = [
     path('request_deposit/<int:record_id>/', views.request_deposit, name='request_deposit'),
     path('pay_deposit/<int:record_id>/', views.pay_deposit, name='pay_deposit'),
     path('payment_success/', views.payment_success, name='payment_success'),
+    path('webhooks/razorpay/', views.razorpay_webhook, name='razorpay_webhook'),
     path('transactions/', views.transaction_history_view, name='transaction_history'),
     path('notifications/', views.notifications_view, name='notifications'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
+    path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/read-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
     path('leave_feedback/<int:record_id>/', views.leave_feedback_view, name='leave_feedback'),
     path('terms/', views.terms_view, name='terms'),
     path('privacy/', views.privacy_view, name='privacy'),
@@ -3,70 +3,210 @@ from django.contrib.auth import login, authenticate, logout, update_session_auth
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
-from django.utils import timezone
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Count, Q
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.urls import reverse
 import razorpay
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponse
-import qrcode
-import io
-from django.core.mail import send_mail
-from .models import User, Item, BorrowRecord, Feedback, Notification
-from .forms import CustomUserCreationForm, ItemForm, ContactForm, UserUpdateForm, PasswordChangeForm, FeedbackForm
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from django.template.loader import render_to_string
+import json
+from urllib.parse import urlencode
+from .models import User, Item, BorrowRecord, Feedback, Notification, PaymentIntent, Reservation
+from .forms import CustomUserCreationForm, ItemForm, ContactForm, UserUpdateForm, PasswordChangeForm, FeedbackForm, ReservationForm
+from .search import get_search_backend
+from .pagination import KeysetPaginator, cached_count
+from .geo import nearby_items, parse_point, parse_radius
+from .catalogue_cache import cached_fragment, render_item_cards
+from .notifications import mark_all_read, mark_read
+from .realtime import event_stream
+from .mail import enqueue_email
+from .qr import CONTENT_TYPES, get_qr_image, pregenerate_qr_images, qr_etag
+from . import reservations, transitions
+from .db import use_read_replica
+from .conditional import browse_etag, home_etag, item_etag, revalidate
+from .profiles import profile_summary
+from .reservations import booked_ranges, free_between, parse_date_range
+from .payments import get_gateway, start_payment, complete_payment, handle_webhook_event, GatewayUnavailable
+
+# Search radius used by browse when ?near= is given without ?radius=.
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 100.0
+
+# Borrow records shown per page on the borrower and lender dashboards.
+DASHBOARD_PAGE_SIZE = 20
+
+NOTIFICATIONS_PAGE_SIZE = 20
+
+# Listed items and reviews shown per page on a public profile.
+PROFILE_ITEMS_PAGE_SIZE = 8
+PROFILE_REVIEWS_PAGE_SIZE = 10
+
+def paginate(object_list, page, per_page=8, count=None):
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        # The caller already knows the total; skip the paginator's COUNT query.
+        paginator.count = count
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
 
+@revalidate(home_etag)
 def home(request):
-    featured_items = Item.objects.filter(is_available=True).order_by('-date_posted')[:4]
+    def render_featured():
+        featured_items = list(Item.objects.filter(is_available=True).select_related('owner').order_by('-date_posted')[:4])
+        return render_to_string('includes/featured_items.html', {'cards': render_item_cards(featured_items)})
+
+    featured_html, hit = cached_fragment('featured', [], render_featured)
     context = {
-        'featured_items': featured_items
+        'featured_html': featured_html
     }
-    return render(request, 'index.html', context)
+    response = render(request, 'index.html', context)
+    response['X-Catalogue-Cache'] = 'hit' if hit else 'miss'
+    return response
 
+@use_read_replica
+@revalidate(browse_etag)
 def browse_items(request):
-    items_list = Item.objects.filter(is_available=True).order_by('-date_posted')
     query = request.GET.get('q')
     category = request.GET.get('category')
     location = request.GET.get('location')
-
-    if query:
-        items_list = items_list.filter(name__icontains=query)
-    
-    if category:
-        items_list = items_list.filter(category=category)
-        
-    if location:
-        items_list = items_list.filter(owner__location__icontains=location)
-
-    paginator = Paginator(items_list, 8)
+    near = request.GET.get('near')
+    radius = request.GET.get('radius')
     page = request.GET.get('page')
-    try:
-        items = paginator.page(page)
-    except PageNotAnInteger:
-        items = paginator.page(1)
-    except EmptyPage:
-        items = paginator.page(paginator.num_pages)
+    cursor = request.GET.get('cursor')
+    available_from = request.GET.get('available_from')
+    available_to = request.GET.get('available_to')
+
+    origin = None
+    if near == 'me' and request.user.is_authenticated and request.user.geohash:
+        origin = (request.user.latitude, request.user.longitude)
+    elif near:
+        origin = parse_point(near)
+    radius_km = parse_radius(radius, DEFAULT_RADIUS_KM, MAX_RADIUS_KM)
+    date_range = parse_date_range(available_from, available_to)
+
+    filters = {
+        key: value
+        for key, value in (('q', query), ('category', category), ('location', location), ('near', near), ('radius', radius))
+        if value
+    }
+    if date_range:
+        filters['available_from'], filters['available_to'] = (day.isoformat() for day in date_range)
+
+    def render_results():
+        if date_range:
+            # Items out on loan today may still be free later, so availability
+            # over the dates replaces the is_available flag.
+            items_list = free_between(Item.objects.select_related('owner'), *date_range)
+        else:
+            items_list = Item.objects.filter(is_available=True).select_related('owner')
+        if category:
+            items_list = items_list.filter(category=category)
+
+        if origin:
+            if query or location:
+                items_list = items_list.filter(pk__in=get_search_backend().search(query=query, location=location))
+            items = paginate(nearby_items(items_list, origin, radius_km), page)
+            total_count = items.paginator.count
+        elif query or location:
+            # Text search is answered by the search index, which returns ids best
+            # match first; only the ids are paginated and just one page is loaded.
+            ranked_ids = get_search_backend().search(query=query, location=location)
+            matching_ids = set(items_list.filter(pk__in=ranked_ids).values_list('pk', flat=True))
+            items = paginate([item_id for item_id in ranked_ids if item_id in matching_ids], page)
+            page_items = Item.objects.select_related('owner').in_bulk(items.object_list)
+            items.object_list = [page_items[item_id] for item_id in items.object_list if item_id in page_items]
+            total_count = items.paginator.count
+        else:
+            # The plain listing walks the (is_available, category, date_posted)
+            # indexes with a cursor instead of COUNT + OFFSET.
+            items = KeysetPaginator(items_list, 8).page(cursor)
+            dates = ':'.join(day.isoformat() for day in date_range) if date_range else ''
+            total_count = cached_count(items_list, f'browse:{category or ""}:{dates}')
+
+        return render_to_string('includes/browse_results.html', {
+            'items': items,
+            'cards': render_item_cards(list(items)),
+            'total_count': total_count,
+            'filter_query': urlencode(filters),
+        })
+
+    # Results depend only on the normalized parameters, so every visitor
+    # asking for the same page shares one cached fragment.
+    cache_key = [sorted(filters.items()), origin, radius_km, page, cursor]
+    results_html, hit = cached_fragment('browse', cache_key, render_results)
 
     context = {
-        'items': items,
+        'results_html': results_html,
         'query': query,
         'category_choices': Item.CATEGORY_CHOICES,
         'selected_category': category,
         'location': location,
+        'near': near,
+        'radius_km': radius_km,
+        'available_from': filters.get('available_from'),
+        'available_to': filters.get('available_to'),
     }
-    return render(request, 'browse.html', context)
+    response = render(request, 'browse.html', context)
+    response['X-Catalogue-Cache'] = 'hit' if hit else 'miss'
+    return response
 
+@use_read_replica
+@revalidate(item_etag)
 def item_detail_view(request, item_id):
-    item = get_object_or_404(Item, pk=item_id)
+    item = get_object_or_404(Item.objects.select_related('owner'), pk=item_id)
     context = {
-        'item': item
+        'item': item,
+        'reservations': booked_ranges(item),
+        'reservation_form': ReservationForm(item=item),
     }
     return render(request, 'item_detail.html', context)
 
+@login_required
+@require_POST
+def reserve_item(request, item_id):
+    item = get_object_or_404(Item.objects.select_related('owner'), pk=item_id)
+    if item.owner == request.user:
+        messages.error(request, "You cannot reserve your own item.")
+        return redirect('item_detail', item_id=item.id)
+
+    form = ReservationForm(request.POST, item=item)
+    if not form.is_valid():
+        for error in form.non_field_errors() or ["Please enter valid dates."]:
+            messages.error(request, error)
+        return redirect('item_detail', item_id=item.id)
+
+    start, end = form.cleaned_data['start_date'], form.cleaned_data['end_date']
+    try:
+        reservations.reserve(item, request.user, start, end)
+    except reservations.ReservationConflict as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f"'{item.name}' is reserved for you from {start} to {end}.")
+    return redirect('item_detail', item_id=item.id)
+
+@login_required
+@require_POST
+def cancel_reservation(request, reservation_id):
+    reservation = get_object_or_404(Reservation, pk=reservation_id, borrower=request.user)
+    if reservations.cancel(reservation):
+        messages.success(request, "Your reservation has been cancelled.")
+    else:
+        messages.info(request, "That reservation was already cancelled.")
+    return redirect('item_detail', item_id=reservation.item_id)
+
 @login_required
 def borrow_item_view(request, item_id):
-    item = get_object_or_404(Item, pk=item_id)
+    item = get_object_or_404(Item.objects.select_related('owner'), pk=item_id)
 
     if item.owner == request.user:
         messages.error(request, "You cannot rent your own item.")
@@ -81,25 +221,22 @@ def borrow_item_view(request, item_id):
     # Check if the rental fee is a positive number to start the payment process
     if rental_fee and rental_fee > 0:
         # --- This block is now correctly indented ---
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
-        payment_data = {
-            'amount': int(rental_fee * 100),
-            'currency': 'INR',
-            'receipt': f'receipt_borrowbuddy_rental_{item.id}_{request.user.id}',
-            'notes': { 'item_id': item.id, 'user_id': request.user.id }
-        }
-
         try:
-            order = client.order.create(data=payment_data)
+            order = start_payment(
+                'RENTAL', item, request.user, rental_fee,
+                receipt=f'receipt_borrowbuddy_rental_{item.id}_{request.user.id}',
+            )
             context = {
                 'item': item,
                 'razorpay_order_id': order['id'],
                 'razorpay_key_id': settings.RAZORPAY_KEY_ID,
-                'razorpay_amount': payment_data['amount']
+                'razorpay_amount': order['amount']
             }
             return render(request, 'initiate_payment.html', context)
 
+        except GatewayUnavailable:
+            messages.error(request, "Payments are temporarily unavailable. Please try again in a few minutes.")
+            return redirect('item_detail', item_id=item.id)
         except Exception as e:
             messages.error(request, f"Payment gateway error: {str(e)}")
             return redirect('item_detail', item_id=item.id)
@@ -125,14 +262,16 @@ def borrow_item_view(request, item_id):
 
 @login_required
 def approve_request_view(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id, item__owner=request.user)
-    if record.status == 'PENDING':
-        record.status = 'ON_LOAN'
-        record.item.is_available = False
-        record.item.save()
-        days_to_add = record.item.borrowing_period
-        record.return_date = timezone.now() + timezone.timedelta(days=days_to_add)
-        record.save()
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, item__owner=request.user)
+    try:
+        approved = transitions.approve(record)
+    except reservations.ReservationConflict as e:
+        messages.error(request, f"You can't approve this request yet: {e}")
+        return redirect('lended_items')
+    if approved:
+        # Render the return QR now so the owner's first scan is served from cache
+        qr_url = request.build_absolute_uri(reverse('confirm_return_by_qr', args=[record.return_token]))
+        pregenerate_qr_images(record.return_token, qr_url)
         
         # Notify borrower
         Notification.objects.create(
@@ -142,16 +281,16 @@ def approve_request_view(request, record_id):
         )
         
         messages.success(request, f"You have approved the request for '{record.item.name}'.")
+    elif record.status == 'PENDING':
+        messages.error(request, f"'{record.item.name}' is already on loan to someone else.")
     else:
         messages.error(request, "This request is not pending approval.")
     return redirect('lended_items')
 
 @login_required
 def reject_request_view(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id, item__owner=request.user)
-    if record.status == 'PENDING':
-        record.status = 'CANCELLED'
-        record.save()
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, item__owner=request.user)
+    if transitions.reject(record):
         
         # Notify borrower
         Notification.objects.create(
@@ -167,11 +306,8 @@ def reject_request_view(request, record_id):
 
 @login_required
 def mark_as_returned_view(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id, borrower=request.user)
-    if record.status == 'ON_LOAN':
-        record.status = 'RETURN_PENDING'
-        record.save()
-        
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, borrower=request.user)
+    if transitions.mark_returned(record):
         # Notify owner
         Notification.objects.create(
             recipient=record.item.owner,
@@ -186,13 +322,8 @@ def mark_as_returned_view(request, record_id):
 
 @login_required
 def confirm_return_view(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id, item__owner=request.user)
-    if record.status == 'RETURN_PENDING':
-        record.status = 'RETURNED'
-        record.actual_return_date = timezone.now()
-        record.item.is_available = True
-        record.item.save()
-        record.save()
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, item__owner=request.user)
+    if transitions.confirm_return(record):
         
         # Notify borrower
         Notification.objects.create(
@@ -208,7 +339,7 @@ def confirm_return_view(request, record_id):
 
 @login_required
 def leave_feedback_view(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id)
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id)
     if not (request.user == record.borrower or request.user == record.item.owner):
         messages.error(request, "You are not authorized to leave feedback for this transaction.")
         return redirect('home')
@@ -226,10 +357,10 @@ def leave_feedback_view(request, record_id):
             feedback.borrow_record = record
             feedback.reviewer = request.user
             feedback.reviewee = reviewee
-            feedback.save()
-            avg_rating = Feedback.objects.filter(reviewee=reviewee).aggregate(Avg('rating'))['rating__avg']
-            reviewee.average_rating = round(avg_rating, 2)
-            reviewee.save()
+            # The reviewee's rating aggregates are bumped by a post_save
+            # handler; keep them in the same transaction as the insert.
+            with transaction.atomic():
+                feedback.save()
             messages.success(request, "Your feedback has been submitted successfully!")
             return redirect('home')
     else:
@@ -254,14 +385,12 @@ def signup_view(request):
             user.is_active = False
             user.save()
             
-            # Send verification email
+            # Queue the verification email; the send_queued_mail worker delivers it
             verification_link = request.build_absolute_uri(reverse('verify_email', args=[user.verification_token]))
-            send_mail(
+            enqueue_email(
                 'Verify your BorrowBuddy account',
                 f'Please click the following link to verify your account: {verification_link}',
-                'from@example.com', # This will be ignored by the console backend
                 [user.email],
-                fail_silently=False,
             )
             
             messages.success(request, 'Please check your email to verify your account.')
@@ -340,20 +469,41 @@ def add_item_view(request):
         form = ItemForm()
     return render(request, 'additem.html', {'form': form})
 
+def dashboard_context(request, records):
+    """Split a user's borrow records into status tabs and paginate the selected one."""
+    status_group = request.GET.get('status')
+    if status_group not in BorrowRecord.STATUS_GROUPS:
+        status_group = next(iter(BorrowRecord.STATUS_GROUPS))
+
+    # One aggregate for every tab's badge instead of a COUNT per tab.
+    counts = records.aggregate(**{
+        group: Count('pk', filter=Q(status__in=statuses))
+        for group, statuses in BorrowRecord.STATUS_GROUPS.items()
+    })
+    page_records = paginate(
+        records.filter(status__in=BorrowRecord.STATUS_GROUPS[status_group]).order_by('-borrow_date', '-pk'),
+        request.GET.get('page'),
+        per_page=DASHBOARD_PAGE_SIZE,
+        count=counts[status_group],
+    )
+    return {
+        'records': page_records,
+        'status_group': status_group,
+        'status_tabs': [(group, counts[group]) for group in BorrowRecord.STATUS_GROUPS],
+    }
+
 @login_required
 def borrowed_items_view(request):
-    borrowed_records = BorrowRecord.objects.filter(borrower=request.user).order_by('-borrow_date')
-    context = {
-        'borrowed_records': borrowed_records
-    }
+    borrowed_records = BorrowRecord.objects.filter(borrower=request.user).select_related('item__owner', 'feedback')
+    context = dashboard_context(request, borrowed_records)
+    context['borrowed_records'] = context['records']
     return render(request, 'borrowed.html', context)
 
 @login_required
 def lended_items_view(request):
-    lended_records = BorrowRecord.objects.filter(item__owner=request.user).order_by('-borrow_date')
-    context = {
-        'lended_records': lended_records
-    }
+    lended_records = BorrowRecord.objects.filter(item__owner=request.user).select_related('item', 'borrower', 'feedback')
+    context = dashboard_context(request, lended_records)
+    context['lended_records'] = context['records']
     return render(request, 'lended.html', context)
 
 def contact_view(request):
@@ -370,38 +520,66 @@ def contact_view(request):
             email_subject = f"New Contact Form Message: {subject}"
             email_message = f"You have a new message from:\n\nName: {full_name}\nEmail: {from_email}\n\nMessage:\n{message}"
 
-            try:
-                # Send the email
-                send_mail(
-                    email_subject,
-                    email_message,
-                    settings.EMAIL_HOST_USER, # Sender's email (from settings)
-                    [settings.EMAIL_HOST_USER], # Recipient's email (sending to yourself)
-                    fail_silently=False,
-                )
-                messages.success(request, 'Your message has been sent successfully!')
-                return redirect('home')
-
-            except Exception as e:
-                messages.error(request, f'Sorry, there was an error sending your message. Please try again later.')
+            # Queue the email to ourselves; delivery happens in the worker
+            enqueue_email(
+                email_subject,
+                email_message,
+                [settings.EMAIL_HOST_USER],
+                from_email=settings.EMAIL_HOST_USER,
+            )
+            messages.success(request, 'Your message has been sent successfully!')
+            return redirect('home')
     else:
         form = ContactForm()
     return render(request, 'contact.html', {'form': form})
 
+async def notification_stream(request):
+    """Server-Sent Events stream of the user's new notifications and unread count."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI each open stream would pin a worker thread; 204 tells
+        # EventSource not to reconnect, and pages fall back to reloads.
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(event_stream(user.pk, user.unread_notifications_count), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def notifications_view(request):
-    notifications = Notification.objects.filter(recipient=request.user).order_by('-timestamp')
-    unread_notifications = notifications.filter(is_read=False)
-    unread_notifications.update(is_read=True)
-    return render(request, 'notifications.html', {'notifications': notifications})
+    # Newest first, one index range scan per page however old the account is.
+    paginator = KeysetPaginator(Notification.objects.filter(recipient=request.user), NOTIFICATIONS_PAGE_SIZE, field='timestamp')
+    return render(request, 'notifications.html', {'notifications': paginator.page(request.GET.get('cursor'))})
+
+def redirect_back_to_inbox(request):
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}, require_https=request.is_secure()):
+        return redirect(next_url)
+    return redirect('notifications')
+
+@login_required
+@require_POST
+def mark_notification_read(request, notification_id):
+    mark_read(request.user, notification_id)
+    return redirect_back_to_inbox(request)
+
+@login_required
+@require_POST
+def mark_all_notifications_read(request):
+    marked = mark_all_read(request.user)
+    if marked:
+        messages.success(request, f"Marked {marked} notification{'s' if marked != 1 else ''} as read.")
+    return redirect_back_to_inbox(request)
 
 
 @login_required
 def request_deposit(request, record_id):
-    record = get_object_or_404(BorrowRecord, pk=record_id, item__owner=request.user)
-    if record.item.deposit_amount and record.item.deposit_amount > 0:
-        record.status = 'AWAITING_DEPOSIT'
-        record.save()
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, item__owner=request.user)
+    if not (record.item.deposit_amount and record.item.deposit_amount > 0):
+        messages.error(request, 'No deposit amount is set for this item.')
+    elif transitions.request_deposit(record):
 
         # Send notification to borrower
         Notification.objects.create(
@@ -411,7 +589,7 @@ def request_deposit(request, record_id):
         )
         messages.success(request, 'Deposit request has been sent to the borrower.')
     else:
-        messages.error(request, 'No deposit amount is set for this item.')
+        messages.error(request, 'A deposit can only be requested while the item is on loan.')
     return redirect('lended_items')
 
 @csrf_exempt
@@ -429,76 +607,69 @@ def payment_success(request):
                 'razorpay_signature': signature
             }
 
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
-            # Verify the payment signature
-            client.utility.verify_payment_signature(params_dict)
-
-            # --- Create the Borrow Record AFTER successful payment ---
-            # Fetch the order to get the item_id and user_id from notes
-            order_details = client.order.fetch(order_id)
-            item_id = order_details['notes']['item_id']
-            user_id = order_details['notes']['user_id']
-
-            item = Item.objects.get(pk=item_id)
-            borrower = User.objects.get(pk=user_id)
-
-            # Create the borrow record
-            record = BorrowRecord.objects.create(
-                item=item,
-                borrower=borrower,
-                status='PENDING',  # Set status to PENDING for owner's approval
-                razorpay_order_id=order_id,
-                razorpay_payment_id=payment_id,
-                razorpay_payment_signature=signature
-            )
-
-            # Create a notification for the item owner
-            Notification.objects.create(
-                recipient=item.owner,
-                message=f"{borrower.username} has paid the rental fee and requested to borrow your item: {item.name}",
-                link=reverse('lended_items')
-            )
+            # Verify the payment signature (a local HMAC check)
+            get_gateway().verify_payment_signature(params_dict)
 
+            # The local intent says what was paid for; no call back to the gateway.
+            intent, _ = complete_payment(order_id, payment_id, signature)
+            if intent.purpose == 'DEPOSIT':
+                return JsonResponse({'status': 'success', 'message': 'Deposit paid successfully!'})
             return JsonResponse({'status': 'success', 'message': 'Payment successful and request sent!'})
 
+        except PaymentIntent.DoesNotExist:
+            return JsonResponse({'status': 'failure', 'message': 'Unknown order.'}, status=404)
         except razorpay.errors.SignatureVerificationError:
             return JsonResponse({'status': 'failure', 'message': 'Payment verification failed.'}, status=400)
+        except GatewayUnavailable as e:
+            return JsonResponse({'status': 'failure', 'message': str(e)}, status=503)
         except Exception as e:
             return JsonResponse({'status': 'failure', 'message': str(e)}, status=400)
 
     return JsonResponse({'status': 'failure', 'message': 'Invalid request method.'}, status=400)
 
+@csrf_exempt
+def razorpay_webhook(request):
+    if request.method != 'POST':
+        return JsonResponse({'status': 'failure', 'message': 'Invalid request method.'}, status=405)
+    if not settings.RAZORPAY_WEBHOOK_SECRET:
+        return JsonResponse({'status': 'failure', 'message': 'Webhooks are not configured.'}, status=503)
+
+    body = request.body.decode('utf-8')
+    try:
+        get_gateway().verify_webhook_signature(body, request.headers.get('X-Razorpay-Signature', ''), settings.RAZORPAY_WEBHOOK_SECRET)
+        payload = json.loads(body)
+    except razorpay.errors.SignatureVerificationError:
+        return JsonResponse({'status': 'failure', 'message': 'Invalid signature.'}, status=400)
+    except ValueError:
+        return JsonResponse({'status': 'failure', 'message': 'Invalid payload.'}, status=400)
+
+    # Razorpay retries deliveries; replays are acknowledged but not re-applied.
+    processed = handle_webhook_event(request.headers.get('X-Razorpay-Event-Id'), payload)
+    return JsonResponse({'status': 'success' if processed else 'duplicate'})
+
 @login_required
 def generate_qr_code(request, record_id):
     record = get_object_or_404(BorrowRecord, pk=record_id, item__owner=request.user)
     qr_url = request.build_absolute_uri(reverse('confirm_return_by_qr', args=[record.return_token]))
-    
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(qr_url)
-    qr.make(fit=True)
+    fmt = 'svg' if request.GET.get('format') == 'svg' else 'png'
 
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    buffer = io.BytesIO()
-    img.save(buffer, "PNG")
-    buffer.seek(0)
-    
-    return HttpResponse(buffer, content_type="image/png")
+    # The image never changes for a token, so browsers may keep it for a year
+    # and revalidate with the ETag without us rendering anything.
+    etag = qr_etag(record.return_token, qr_url, fmt)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(get_qr_image(record.return_token, qr_url, fmt), content_type=CONTENT_TYPES[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 @login_required
 def confirm_return_by_qr(request, token):
-    record = get_object_or_404(BorrowRecord, return_token=token)
+    record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), return_token=token)
     
     if request.method == 'POST':
-        if record.status == 'ON_LOAN':
-            record.status = 'RETURN_PENDING'
-            record.save()
+        if transitions.mark_returned(record):
             
             # Notify owner
             Notification.objects.create(
@@ -527,7 +698,7 @@ def verify_email(request, token):
 @login_required
 def transaction_history_view(request):
     # Fetch all borrow records where the current user was the borrower and paid a deposit
-    transactions = BorrowRecord.objects.filter(borrower=request.user, deposit_paid=True).order_by('-borrow_date')
+    transactions = BorrowRecord.objects.filter(borrower=request.user, deposit_paid=True).select_related('item__owner').order_by('-borrow_date')
     
     context = {
         'transactions': transactions
@@ -539,33 +710,25 @@ def transaction_history_view(request):
 def pay_deposit(request, record_id):
     if request.method == 'POST':
         # Find the record, ensuring the logged-in user is the borrower
-        record = get_object_or_404(BorrowRecord, pk=record_id, borrower=request.user)
+        record = get_object_or_404(BorrowRecord.objects.select_related('item__owner', 'borrower'), pk=record_id, borrower=request.user)
         deposit_amount = record.item.deposit_amount
         
         # Check if a deposit is actually required
         if not deposit_amount or deposit_amount <= 0:
             return JsonResponse({'error': 'This item does not require a deposit.'}, status=400)
 
-        # Create a Razorpay client
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-        
-        # Prepare the payment data
-        payment_data = {
-            'amount': int(deposit_amount * 100),  # Amount in the smallest currency unit (paise)
-            'currency': 'INR',
-            'receipt': f'receipt_borrowbuddy_{record.id}',
-            'payment_capture': 1
-        }
-        
         try:
-            # Create the order on Razorpay's servers
-            order = client.order.create(data=payment_data)
-            
+            # Create the order on Razorpay's servers and remember it locally
+            order = start_payment(
+                'DEPOSIT', record.item, request.user, deposit_amount,
+                receipt=f'receipt_borrowbuddy_{record.id}', borrow_record=record, payment_capture=1,
+            )
+
             # Save the order ID to our database
             record.razorpay_order_id = order['id']
             record.deposit_amount = deposit_amount
-            record.save()
-            
+            record.save(update_fields=['razorpay_order_id', 'deposit_amount'])
+
             # Return the order details to the frontend JavaScript
             return JsonResponse({
                 'order_id': order['id'],
@@ -575,6 +738,8 @@ def pay_deposit(request, record_id):
                 'name': 'BorrowBuddy Deposit',
                 'description': f'Deposit for {record.item.name}'
             })
+        except GatewayUnavailable as e:
+            return JsonResponse({'error': str(e)}, status=503)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
             
@@ -592,18 +757,24 @@ def about_view(request):
 def faq_view(request):
     return render(request, 'faq.html')
 
+@use_read_replica
 def public_profile_view(request, username):
     # Get the user whose profile is being viewed
     profile_user = get_object_or_404(User, username=username)
 
-    # Get all the items that this user is currently lending
-    lended_items = Item.objects.filter(owner=profile_user, is_available=True).order_by('-date_posted')
-
-    # Get all the feedback/reviews for this user
-    reviews = Feedback.objects.filter(reviewee=profile_user).order_by('-created_at')
+    # Items and reviews are paged independently, each an index range scan on
+    # the user's rows; the counts come from a cached summary.
+    lended_items = KeysetPaginator(
+        Item.objects.filter(owner=profile_user, is_available=True), PROFILE_ITEMS_PAGE_SIZE,
+    ).page(request.GET.get('items_cursor'))
+    reviews = KeysetPaginator(
+        Feedback.objects.filter(reviewee=profile_user).select_related('reviewer'), PROFILE_REVIEWS_PAGE_SIZE,
+        field='created_at',
+    ).page(request.GET.get('reviews_cursor'))
 
     context = {
         'profile_user': profile_user,
+        'summary': profile_summary(profile_user),
         'lended_items': lended_items,
         'reviews': reviews
     }
@@ -130,4 +130,33 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Live notifications over Server-Sent Events
+    const bell = document.querySelector('#notification-bell');
+    if (bell && window.EventSource) {
+        const badge = bell.querySelector('.badge');
+        let unread = parseInt(badge.textContent, 10) || 0;
+
+        const setUnread = count => {
+            unread = Math.max(count, 0);
+            badge.textContent = unread;
+            badge.hidden = unread === 0;
+        };
+
+        // EventSource reconnects on its own after network errors, waiting
+        // for the server's retry interval; a 204 or 401 ends the stream.
+        const stream = new EventSource(bell.dataset.streamUrl);
+        stream.addEventListener('unread', event => {
+            setUnread(JSON.parse(event.data).count);
+        });
+        stream.addEventListener('notification', event => {
+            const notification = JSON.parse(event.data);
+            setUnread(unread + 1);
+            bell.title = notification.message;
+        });
+        stream.addEventListener('read', () => {
+            setUnread(unread - 1);
+        });
+        window.addEventListener('pagehide', () => stream.close());
+    }
+
 });